@@ -1,19 +1,38 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils import timezone
+
+from . import exports, order_events, order_status
 from .models import (
     Customer,
     Product,
     Cart,
-    OrderPlaced
+    Order,
+    OrderEvent,
+    OrderLine,
 )
 
+def export_action(fmt):
+    """Admin action streaming the selected rows as ``fmt`` (see app/exports.py)."""
+    def action(modeladmin, request, queryset):
+        return exports.streaming_response(exports.export_for(modeladmin.model), queryset, fmt)
+    action.__name__ = f'export_{fmt}'
+    action.short_description = f'Export selected rows as {fmt.upper()}'
+    return action
+
+
+EXPORT_ACTIONS = [export_action(fmt) for fmt in exports.FORMATS]
+
+
 @admin.register(Customer)
 class CustomerModelAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'name', 'locality', 'city', 'zipcode', 'state']
+    actions = EXPORT_ACTIONS
 
 
 @admin.register(Product)
 class ProductModelAdmin(admin.ModelAdmin):
     list_display = ['id', 'title', 'selling_price', 'discounted_price', 'brand', 'category', 'product_image']
+    actions = EXPORT_ACTIONS
 
 
 @admin.register(Cart)
@@ -21,6 +40,57 @@ class CartModelAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'product', 'quantity']
 
 
-@admin.register(OrderPlaced)
-class OrderPlacedModelAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'customer', 'product', 'quantity', 'ordered_date', 'status']
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    raw_id_fields = ['product']
+
+
+class OrderEventInline(admin.TabularInline):
+    """The status history, read-only: events are append-only."""
+    model = OrderEvent
+    extra = 0
+    fields = ['created_at', 'status', 'source']
+    readonly_fields = fields
+    ordering = ['created_at', 'id']
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+def status_action(status):
+    """Admin action moving the selected orders to ``status`` through the state machine."""
+    def action(modeladmin, request, queryset):
+        rows = ((None, tracking_id, status) for tracking_id in queryset.values_list('tracking_id', flat=True))
+        report = order_status.apply_status_updates(rows).as_dict()
+        modeladmin.message_user(request, f"{report['applied']} orders marked {status}.", messages.SUCCESS)
+        if report['rejected']:
+            reasons = ', '.join(f'{reason} ({count})' for reason, count in report['rejected_by_reason'].items())
+            modeladmin.message_user(request, f"{report['rejected']} skipped: {reasons}", messages.WARNING)
+    action.__name__ = f"mark_{status.lower().replace(' ', '_')}"
+    action.short_description = f'Mark selected orders as {status}'
+    return action
+
+
+@admin.register(Order)
+class OrderModelAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'user', 'customer', 'tracking_id', 'total', 'payment_method', 'ordered_date',
+        'status', 'status_changed_at',
+    ]
+    list_select_related = ['user', 'customer']
+    readonly_fields = ['status_changed_at']
+    inlines = [OrderLineInline, OrderEventInline]
+    actions = [status_action(status) for status in order_status.FLOW[1:] + [order_status.CANCELLED]] + EXPORT_ACTIONS
+
+    def save_model(self, request, obj, form, change):
+        status_changed = not change or 'status' in form.changed_data
+        if status_changed:
+            obj.status_changed_at = timezone.now()
+        super().save_model(request, obj, form, change)
+        if status_changed:
+            order_events.record(obj, 'admin')
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class AppConfig(AppConfig):
     name = 'app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import instrumentation, signals  # noqa: F401
+
+        # QueryCounter sees queries on every alias and thread
+        connection_created.connect(instrumentation.install, dispatch_uid='app.instrumentation')
+        instrumentation.install_all()
@@ -0,0 +1,68 @@
+"""Shared helpers for the ``bench_*`` management commands.
+
+Benchmarks run against a throwaway test database so they never touch
+``db.sqlite3``.
+"""
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import override_settings
+
+
+@contextmanager
+def benchmark_database(name=None):
+    """Create a fresh test database for the duration of the block.
+
+    Pass a file ``name`` when threads or worker processes must share it
+    (SQLite test databases are in-memory by default).
+    """
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if name:
+        connection.settings_dict['TEST']['NAME'] = name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ser', 'tan', 'vo', 'rex', 'di', 'pul', 'zen', 'ora', 'fi', 'gam', 'ble', 'nu', 'qui']
+
+
+def make_vocabulary(rng, size):
+    """Deterministic pseudo-words so term frequencies look like a real catalogue."""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def time_calls(func, repeat):
+    """Call ``func`` ``repeat`` times and return per-call latencies in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    """Return requests/sec and latency percentiles (ms) for ``timings``."""
+    ordered = sorted(timings)
+    total = sum(ordered)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    return {
+        'count': len(ordered),
+        'rps': len(ordered) / total if total else 0.0,
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+    }
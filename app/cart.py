@@ -0,0 +1,237 @@
+"""Cart mutations.
+
+Quantity changes are single ``UPDATE ... SET quantity = quantity +/- 1``
+statements built from ``F()`` expressions, so concurrent clicks never lose
+an increment and no row is read back before it is written. The
+``(user, product)`` unique constraint on ``Cart`` makes adding a product
+race-free as well.
+
+Every mutation also refreshes the user's cached cart summary (item count
+and subtotal) that the navbar badge reads, see ``cart_badge``: queryset
+updates and raw SQL here call ``cart_changed``, while saves and deletes of
+``Cart`` rows (admin edits, cascades from a deleted product) reach it
+through the signals in ``app/signals.py``.
+"""
+import logging
+from itertools import count
+from threading import local
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import Cart, Product
+from .pricing import cart_totals
+
+logger = logging.getLogger(__name__)
+
+
+def add_product(user, product):
+    """Add one ``product`` to ``user``'s cart, creating the line if needed."""
+    if not Cart.objects.filter(user=user, product=product).update(quantity=F('quantity') + 1):
+        try:
+            with transaction.atomic():
+                # post_save refreshes the badge
+                Cart.objects.create(user=user, product=product)
+            return
+        except IntegrityError:
+            # another request created the line first; count this click on it
+            Cart.objects.filter(user=user, product=product).update(quantity=F('quantity') + 1)
+    cart_changed(user.pk)
+
+
+def increment(user, cart_id):
+    """Add one to a cart line. Returns False if the line does not exist."""
+    if Cart.objects.filter(id=cart_id, user=user).update(quantity=F('quantity') + 1):
+        cart_changed(user.pk)
+        return True
+    return False
+
+
+def decrement(user, cart_id):
+    """Take one off a cart line, deleting it when it would drop to zero.
+
+    Returns False if the line does not exist.
+    """
+    line = Cart.objects.filter(id=cart_id, user=user)
+    while True:
+        if line.filter(quantity__gt=1).update(quantity=F('quantity') - 1):
+            cart_changed(user.pk)
+            return True
+        deleted, _ = line.filter(quantity__lte=1).delete()
+        if deleted:
+            # post_delete refreshes the badge
+            return True
+        if not line.exists():
+            return False
+        # quantity went up between the two statements; try again
+
+
+def remove(user, cart_id):
+    """Delete a cart line. Returns False if the line does not exist."""
+    # post_delete refreshes the badge
+    deleted, _ = Cart.objects.filter(id=cart_id, user=user).delete()
+    return bool(deleted)
+
+
+# -------------------------------
+# Navbar badge summary
+# -------------------------------
+BADGE_KEY = 'cart:summary:%s'
+
+
+def cart_badge(user):
+    """``{'count', 'amount'}`` for ``user``'s cart, served from the cache."""
+    summary = cache.get(BADGE_KEY % user.pk)
+    if summary is None:
+        summary = refresh_cart_badge(user.pk)
+    return summary
+
+
+async def acart_badge(user):
+    """``cart_badge`` for async views."""
+    summary = await cache.aget(BADGE_KEY % user.pk)
+    if summary is None:
+        summary = await sync_to_async(refresh_cart_badge)(user.pk)
+    return summary
+
+
+def refresh_cart_badge(user_id):
+    summary = cart_totals(user_id)
+    cache.set(BADGE_KEY % user_id, summary, timeout=settings.CART_BADGE_TIMEOUT)
+    return summary
+
+
+# callbacks are numbered as they are queued; a thread's (so a connection's)
+# latest refresh of each user is kept with the number it was taken at
+_sequence = count()
+_refreshed = local()
+
+
+class BadgeRefresh:
+    """``on_commit`` callback refreshing one user's summary.
+
+    The callbacks of a commit run one after another once it is done, so a
+    refresh of the same user taken after this callback was queued already
+    saw its change: emptying a cart of many lines recomputes it once.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queued = next(_sequence)
+
+    def __call__(self):
+        refreshed = _refreshed.__dict__
+        if refreshed.get(self.user_id, -1) > self.queued:
+            return
+        refreshed[self.user_id] = next(_sequence)
+        try:
+            refresh_cart_badge(self.user_id)
+        except DatabaseError:
+            # the cart write has committed; don't fail the request over the
+            # badge, let the next read recompute it
+            logger.warning('cart badge refresh failed for user %s', self.user_id, exc_info=True)
+            cache.delete(BADGE_KEY % self.user_id)
+
+
+def cart_changed(user_id):
+    """Recompute the cached summary once the current transaction commits."""
+    transaction.on_commit(BadgeRefresh(user_id))
+
+
+def product_repriced(product_id):
+    """Drop the badge of every user with ``product_id`` in their cart.
+
+    One query and one ``delete_many`` after the commit, however many carts
+    hold the product; each badge is recomputed on its owner's next page.
+    """
+    keys = [
+        BADGE_KEY % user_id
+        for user_id in Cart.objects.filter(product_id=product_id).values_list('user_id', flat=True).distinct()
+    ]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# -------------------------------
+# Anonymous carts
+# -------------------------------
+# Visitors who are not logged in keep their cart in a signed cookie
+# ("<product id>-<quantity>" pairs joined by "."), so browsing and filling a
+# cart never writes to the database. On login the cookie is merged into
+# the Cart table with one upsert that adds to existing lines.
+ANON_CART_COOKIE = 'cart'
+ANON_CART_SALT = 'app.cart'
+
+
+def load_anonymous_cart(request):
+    """Return ``{product_id: quantity}`` from the request's cart cookie."""
+    raw = request.get_signed_cookie(ANON_CART_COOKIE, default='', salt=ANON_CART_SALT)
+    lines = {}
+    for pair in raw.split('.') if raw else ():
+        try:
+            product_id, quantity = (int(part) for part in pair.split('-'))
+        except ValueError:
+            continue
+        if quantity > 0:
+            lines[product_id] = quantity
+    return lines
+
+
+def save_anonymous_cart(response, lines):
+    """Write ``lines`` back to the cart cookie (or drop it when empty)."""
+    if not lines:
+        response.delete_cookie(ANON_CART_COOKIE)
+        return response
+    # keep the newest lines if the cookie would grow past the limit
+    items = list(lines.items())[-settings.ANON_CART_MAX_LINES:]
+    response.set_signed_cookie(
+        ANON_CART_COOKIE,
+        '.'.join(f'{pid}-{qty}' for pid, qty in items),
+        salt=ANON_CART_SALT,
+        max_age=settings.ANON_CART_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
+
+def change_anonymous_quantity(lines, product_id, action):
+    """Apply ``'inc'``/``'dec'``/``'remove'`` to ``lines`` in place.
+
+    Returns False if the product is not in the cart.
+    """
+    if product_id not in lines:
+        return False
+    if action == 'inc':
+        lines[product_id] += 1
+    elif action == 'dec' and lines[product_id] > 1:
+        lines[product_id] -= 1
+    elif action in ('dec', 'remove'):
+        del lines[product_id]
+    return True
+
+
+def merge_anonymous_cart(user, lines):
+    """Add the cookie cart ``lines`` to ``user``'s Cart rows in one upsert.
+
+    Existing lines get ``quantity = quantity + <cookie quantity>`` in the
+    same statement, so a concurrent add on another device is not lost.
+    ``bulk_create(update_conflicts=True)`` can only overwrite the column,
+    hence the SQL.
+    """
+    if not lines:
+        return
+    valid = set(Product.objects.filter(id__in=lines).values_list('id', flat=True))
+    rows = [(user.pk, pid, qty) for pid, qty in lines.items() if pid in valid]
+    if rows:
+        table = Cart._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} (user_id, product_id, quantity) VALUES (%s, %s, %s) '
+                f'ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = {table}.quantity + excluded.quantity',
+                rows,
+            )
+    cart_changed(user.pk)
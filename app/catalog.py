@@ -0,0 +1,127 @@
+"""Category listing engine used by the mobile/topwear/bottomwear/shoes/laptop pages.
+
+Each category page is described by one entry in ``CATEGORY_LISTINGS``.
+Listings are ordered by ``(discounted_price, id)`` and paginated with a
+keyset cursor (``?after=<price>_<id>``) so every page is an index range scan
+no matter how deep the user pages.
+
+The listing views are async: pages are read with ``async for`` and
+rendered with ``arender`` (see ``app/shortcuts.py``).
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Product
+from .shortcuts import arender
+
+# key -> category code, template, template variable, brand facets and
+# price bands ({slug: (lookup, threshold)}) for that listing page
+CATEGORY_LISTINGS = {
+    'mobile': {
+        'category': 'M',
+        'template': 'app/mobile.html',
+        'context_name': 'mobiles',
+        'brands': ['REDMI', 'SAMSUNG'],
+        'price_bands': {'below': ('lt', 15000), 'above': ('gt', 15000)},
+    },
+    'topwear': {
+        'category': 'TW',
+        'template': 'app/topware.html',
+        'context_name': 'topwears',
+        'brands': [],
+        'price_bands': {'below': ('lt', 1000), 'above': ('gt', 1000)},
+    },
+    'bottomwear': {
+        'category': 'BW',
+        'template': 'app/bottomware.html',
+        'context_name': 'bottomwears',
+        'brands': [],
+        'price_bands': {'below': ('lt', 1000), 'above': ('gt', 1000)},
+    },
+    'shoes': {
+        'category': 'S',
+        'template': 'app/shoes.html',
+        'context_name': 'shoes',
+        'brands': ['KNCHDE', 'MYNOT'],
+        'price_bands': {'below': ('lt', 2500), 'above': ('gt', 3000)},
+    },
+    'laptop': {
+        'category': 'L',
+        'template': 'app/laptop.html',
+        'context_name': 'laptops',
+        'brands': ['HP', 'DELL'],
+        'price_bands': {'below': ('lt', 20000), 'above': ('gt', 25000)},
+    },
+}
+
+
+def listing_queryset(listing, data=None):
+    """Products for ``listing`` filtered by a brand or price band slug."""
+    qs = Product.objects.filter(category=listing['category'])
+    if data is None:
+        return qs
+    if data.upper() in listing['brands']:
+        return qs.filter(brand=data)
+    if data in listing['price_bands']:
+        lookup, threshold = listing['price_bands'][data]
+        return qs.filter(**{f'discounted_price__{lookup}': threshold})
+    return qs
+
+
+def parse_cursor(value):
+    """Turn ``'<price>_<id>'`` into ``(price, id)``; ``None`` if malformed."""
+    try:
+        price, pk = value.rsplit('_', 1)
+        return float(price), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def make_cursor(product):
+    return f'{product.discounted_price!r}_{product.id}'
+
+
+def page_queryset(qs, after, page_size):
+    """The rows of the page following ``after``, plus one extra row that
+    tells whether there is a next page."""
+    cursor = parse_cursor(after)
+    if cursor is not None:
+        price, pk = cursor
+        # the __gte bound lets the index seek; the OR only trims equal prices
+        qs = qs.filter(discounted_price__gte=price).filter(
+            Q(discounted_price__gt=price) | Q(id__gt=pk)
+        )
+    return qs.order_by('discounted_price', 'id')[:page_size + 1]
+
+
+def split_page(products, page_size):
+    next_cursor = None
+    if len(products) > page_size:
+        products = products[:page_size]
+        next_cursor = make_cursor(products[-1])
+    return products, next_cursor
+
+
+def keyset_page(qs, after=None, page_size=None):
+    """Return ``(products, next_cursor)`` for the page following ``after``."""
+    page_size = page_size or settings.CATEGORY_PAGE_SIZE
+    return split_page(list(page_queryset(qs, after, page_size)), page_size)
+
+
+async def akeyset_page(qs, after=None, page_size=None):
+    """``keyset_page`` for async views."""
+    page_size = page_size or settings.CATEGORY_PAGE_SIZE
+    products = [product async for product in page_queryset(qs, after, page_size)]
+    return split_page(products, page_size)
+
+
+async def category_listing(request, key, data=None):
+    """Render one page of the category listing ``key``."""
+    listing = CATEGORY_LISTINGS[key]
+    products, next_cursor = await akeyset_page(
+        listing_queryset(listing, data), after=request.GET.get('after'),
+    )
+    return await arender(request, listing['template'], {
+        listing['context_name']: products,
+        'next_cursor': next_cursor,
+    })
@@ -0,0 +1,14 @@
+from . import cart
+
+
+def cart_badge(request):
+    """Cart item count (and subtotal for logged-in users) for the navbar."""
+    # async views look it up before rendering, see app/shortcuts.py
+    if hasattr(request, 'cart_badge'):
+        return {'cart_badge': request.cart_badge}
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return {'cart_badge': cart.cart_badge(user)}
+    # anonymous carts are a cookie; counting them needs no database access
+    lines = cart.load_anonymous_cart(request)
+    return {'cart_badge': {'count': sum(lines.values()), 'amount': None}}
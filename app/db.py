@@ -0,0 +1,41 @@
+"""SQLite connection tuning.
+
+Every new SQLite connection gets the pragmas of the active database
+profile (``DATABASE_PROFILE`` in settings):
+
+* ``journal_mode=WAL``: readers no longer block the writer and vice versa;
+* ``synchronous=NORMAL``: with WAL, fsync only at checkpoints;
+* ``busy_timeout``: wait for a lock instead of failing straight away;
+* ``mmap_size``/``cache_size``: read hot pages from memory.
+
+Only WAL is recorded in the database file itself, so it alone is opt-in
+(``DATABASE_PROFILE=tuned``); the ``default`` profile applies the rest.
+
+The ``connection_created`` receiver is connected in ``app/signals.py``.
+"""
+from django.conf import settings
+
+
+def sqlite_pragmas():
+    return settings.SQLITE_PROFILES[settings.DATABASE_PROFILE]['pragmas']
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def current_pragmas(connection):
+    """Effective value of every tuned pragma on ``connection`` (for checks)."""
+    names = {name for profile in settings.SQLITE_PROFILES.values() for name in profile['pragmas']}
+    with connection.cursor() as cursor:
+        values = {}
+        for name in sorted(names):
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            # e.g. mmap_size has no value on in-memory databases
+            values[name] = row[0] if row else None
+    return values
@@ -0,0 +1,87 @@
+"""Cached, per-category fragments for the home page carousels.
+
+Each category slider is rendered once from a single grouped query and the
+HTML is stored in Django's cache. Product signals (see ``app/signals.py``)
+drop the fragments whenever the catalogue changes. The home page view is
+async and uses ``aget_home_fragments``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .models import Product
+
+# Order, heading and slider id of each carousel on the home page
+HOME_SECTIONS = [
+    {'category': 'BW', 'heading': 'Bottom Wears', 'slider': 'slider1', 'margin': 'm-3'},
+    {'category': 'TW', 'heading': 'Top Wears', 'slider': 'slider2', 'margin': 'mx-3'},
+    {'category': 'M', 'heading': 'Mobile Phones', 'slider': 'slider3', 'margin': 'mx-3'},
+    {'category': 'L', 'heading': 'Laptops', 'slider': 'slider4', 'margin': 'mx-3'},
+    {'category': 'S', 'heading': 'Shoes', 'slider': 'slider5', 'margin': 'mx-3'},
+]
+
+CACHE_KEY = 'home:section:%s'
+
+
+def section_keys():
+    return [CACHE_KEY % section['category'] for section in HOME_SECTIONS]
+
+
+def get_home_fragments():
+    """Return the rendered HTML of every home page slider, in page order."""
+    keys = section_keys()
+    cached = cache.get_many(keys)
+    missing = missing_sections(keys, cached)
+    if missing:
+        cached.update(render_sections(missing))
+    return [cached[key] for key in keys]
+
+
+async def aget_home_fragments():
+    """``get_home_fragments`` for async views."""
+    keys = section_keys()
+    cached = await cache.aget_many(keys)
+    missing = missing_sections(keys, cached)
+    if missing:
+        cached.update(await arender_sections(missing))
+    return [cached[key] for key in keys]
+
+
+def missing_sections(keys, cached):
+    return [section for section, key in zip(HOME_SECTIONS, keys) if key not in cached]
+
+
+def sections_queryset(sections):
+    categories = [section['category'] for section in sections]
+    return Product.objects.filter(category__in=categories).order_by('category', 'id')
+
+
+def render_fragments(sections, products):
+    grouped = {section['category']: [] for section in sections}
+    for product in products:
+        grouped[product.category].append(product)
+    return {
+        CACHE_KEY % section['category']: render_to_string('app/home_section.html', {
+            'section': section,
+            'products': grouped[section['category']],
+        })
+        for section in sections
+    }
+
+
+def render_sections(sections):
+    """Render and cache ``sections`` using one query for all their products."""
+    fragments = render_fragments(sections, sections_queryset(sections))
+    cache.set_many(fragments, timeout=settings.HOME_CACHE_TIMEOUT)
+    return fragments
+
+
+async def arender_sections(sections):
+    products = [product async for product in sections_queryset(sections)]
+    fragments = render_fragments(sections, products)
+    await cache.aset_many(fragments, timeout=settings.HOME_CACHE_TIMEOUT)
+    return fragments
+
+
+def invalidate():
+    cache.delete_many(section_keys())
@@ -0,0 +1,99 @@
+"""Product image derivatives: resized WebP/AVIF and original-format copies.
+
+For every product image we write fixed-width copies next to the original,
+named ``<stem>.<content hash>.<width>w.<ext>`` so they can be cached
+forever, and record them on ``Product.image_variants``::
+
+    {'source': 'productimg/a.jpg', 'hash': '1a2b3c4d', 'width': 1200,
+     'variants': {'webp': {'200': 'productimg/a.1a2b3c4d.200w.webp', ...},
+                  'jpeg': {...}}}
+
+``build_derivatives`` only needs Pillow and a media root, so the backfill
+command can run it in a process pool.
+"""
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+# Pillow format -> file extension for the "original format" copies
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'AVIF': 'avif', 'GIF': 'png'}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 6},
+    'AVIF': {'quality': 60},
+}
+
+
+def output_formats(original_format):
+    """Formats to write for an image whose source is ``original_format``."""
+    formats = ['WEBP']
+    if settings.IMAGE_DERIVATIVE_AVIF and features.check('avif'):
+        formats.append('AVIF')
+    original = 'PNG' if original_format == 'GIF' else original_format
+    if original in EXTENSIONS and original not in formats:
+        formats.append(original)
+    return formats
+
+
+def build_derivatives(media_root, name, widths, formats=None):
+    """Write the resized copies of media file ``name``; return its variants dict."""
+    path = os.path.join(media_root, name)
+    with open(path, 'rb') as fh:
+        digest = hashlib.sha256(fh.read()).hexdigest()[:8]
+
+    stem, _ = os.path.splitext(name)
+    with Image.open(path) as image:
+        image.load()
+        original_format = image.format
+        formats = formats or output_formats(original_format)
+        # never upscale; always offer at least one copy
+        sizes = [w for w in widths if w < image.width] or [image.width]
+        variants = {}
+        for width in sizes:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                frame = resized
+                if fmt == 'JPEG' and frame.mode not in ('RGB', 'L'):
+                    frame = frame.convert('RGB')
+                ext = EXTENSIONS[fmt]
+                target = f'{stem}.{digest}.{width}w.{ext}'
+                target_path = os.path.join(media_root, target)
+                if not os.path.exists(target_path):
+                    frame.save(target_path, fmt, **SAVE_OPTIONS.get(fmt, {}))
+                variants.setdefault(fmt.lower(), {})[str(width)] = target
+
+    return {'source': name, 'hash': digest, 'width': image.width, 'variants': variants}
+
+
+def generate_for_product(product):
+    """Build derivatives for ``product`` and store them; returns the dict or None."""
+    name = product.product_image.name
+    if not name:
+        return None
+    try:
+        data = build_derivatives(
+            str(settings.MEDIA_ROOT), name, settings.IMAGE_DERIVATIVE_WIDTHS,
+        )
+    except FileNotFoundError:
+        # e.g. fixtures pointing at files that were never uploaded
+        logger.debug('image %s is missing, no derivatives built', name)
+        return None
+    except (OSError, ValueError) as exc:
+        logger.warning('could not build image derivatives for %s: %s', name, exc)
+        return None
+    # queryset update: no save() recursion through post_save
+    type(product).objects.filter(pk=product.pk).update(image_variants=data)
+    product.image_variants = data
+    return data
+
+
+def needs_derivatives(product):
+    variants = product.image_variants or {}
+    return bool(product.product_image.name) and variants.get('source') != product.product_image.name
@@ -0,0 +1,114 @@
+"""Lightweight helpers for counting database queries and timing code paths."""
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.db import connections
+
+# QueryCounters open in the current context. asgiref copies the context into
+# sync_to_async worker threads, so queries that async views run there count too.
+active_counters = ContextVar('active_counters', default=())
+
+
+def count_queries(execute, sql, params, many, context):
+    """execute_wrapper on every connection, feeding the open ``QueryCounter``s."""
+    counters = active_counters.get()
+    if not counters:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for counter in counters:
+            counter.count += 1
+            counter.db_time += elapsed
+
+
+def install(sender=None, connection=None, **kwargs):
+    """Put ``count_queries`` on ``connection``; a ``connection_created`` receiver."""
+    if count_queries not in connection.execute_wrappers:
+        # first in the list: execute_wrapper() pops the last one on exit
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+def install_all():
+    for conn in connections.all(initialized_only=True):
+        install(connection=conn)
+
+
+class QueryCounter:
+    """Context manager that counts queries and DB time, on every database alias.
+
+    Works with DEBUG off and follows the context into ``sync_to_async``
+    threads, e.g.::
+
+        with QueryCounter() as qc:
+            do_work()
+        qc.count, qc.db_time, qc.elapsed
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._token = active_counters.set(active_counters.get() + (self,))
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._start
+        active_counters.reset(self._token)
+        return False
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class RequestMetrics:
+    """Rolling per-view samples of wall time, query count and DB time.
+
+    Each view keeps its last ``window`` requests; ``snapshot()`` turns them
+    into percentiles. Shared by every thread of the process.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, view, elapsed, queries, db_time):
+        with self.lock:
+            samples = self.samples.get(view)
+            if samples is None:
+                samples = self.samples[view] = deque(maxlen=self.window)
+            samples.append((elapsed, queries, db_time))
+
+    def snapshot(self):
+        """``{view: {'count', 'p50_ms', 'p95_ms', 'p99_ms', ...}}``."""
+        with self.lock:
+            samples = {view: list(rows) for view, rows in self.samples.items()}
+        report = {}
+        for view, rows in sorted(samples.items()):
+            elapsed = sorted(row[0] for row in rows)
+            queries = sorted(row[1] for row in rows)
+            db_time = sorted(row[2] for row in rows)
+            report[view] = {
+                'count': len(rows),
+                'p50_ms': round(percentile(elapsed, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(elapsed, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(elapsed, 0.99) * 1000, 3),
+                'queries_p50': percentile(queries, 0.50),
+                'queries_max': queries[-1],
+                'db_p95_ms': round(percentile(db_time, 0.95) * 1000, 3),
+            }
+        return report
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
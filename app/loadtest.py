@@ -0,0 +1,153 @@
+"""Synthetic storefront load: seeded data, user journeys and their results.
+
+A journey is what one shopper does from landing to tracking an order:
+browse the home page and a category, search, open a product, add it to
+the cart, bump its quantity, check out, pay and track the order. Workers
+(threads or forked processes) each log in as their own seeded user and run
+journeys through Django's test ``Client``, recording wall time, status and
+query count for every step. Used by the ``loadtest`` management command.
+"""
+import random
+import time
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client
+
+from .bench import make_vocabulary
+from .instrumentation import QueryCounter, percentile
+from .models import CATEGORY_CHOICES, Cart, Customer, Order, Product
+
+STEPS = [
+    'home', 'category', 'search', 'product-detail', 'add-to-cart',
+    'cart-update-api', 'checkout', 'payment-done', 'track-order',
+]
+CATEGORY_URLS = {'M': '/mobile/', 'L': '/laptops/', 'TW': '/topwear/', 'BW': '/bottomwear/', 'S': '/shoes/'}
+# upper bounds (ms) of the latency histogram buckets; the last one is open
+HISTOGRAM_MS = [5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+def seed(products, users, rng):
+    """Create the catalogue and one user (with an address) per worker slot."""
+    words = make_vocabulary(rng, 2000)
+    categories = [code for code, _ in CATEGORY_CHOICES]
+    Product.objects.bulk_create(
+        [
+            Product(
+                title=' '.join(rng.sample(words, 3)).title(),
+                selling_price=2000,
+                discounted_price=rng.randint(500, 1999),
+                description='Load test product',
+                brand=rng.choice(['Samsung', 'Redmi', 'Dell', 'Nike', 'Levis']),
+                category=categories[i % len(categories)],
+                product_image='productimg/loadtest.jpg',
+            )
+            for i in range(products)
+        ],
+        batch_size=1000,
+    )
+    created = User.objects.bulk_create([User(username=f'shopper{i}') for i in range(users)])
+    Customer.objects.bulk_create([
+        Customer(user=user, name=user.username, locality='Street', city='City',
+                 zipcode=54000, state='Punjab')
+        for user in created
+    ])
+    return words
+
+
+class Journey:
+    def __init__(self, user_id, words, seed_value):
+        self.user = User.objects.get(pk=user_id)
+        self.customer_id = Customer.objects.filter(user=self.user).values_list('id', flat=True)[0]
+        self.product_ids = list(Product.objects.values_list('id', flat=True))
+        self.words = words
+        self.rng = random.Random(seed_value)
+        # server errors are counted per step rather than aborting the run
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(self.user)
+        self.samples = []  # (step, seconds, queries, status)
+
+    def request(self, step, method, url, data=None):
+        with QueryCounter() as qc:
+            response = getattr(self.client, method)(url, data or {})
+        self.samples.append((step, qc.elapsed, qc.count, response.status_code))
+        return response
+
+    def run(self):
+        rng = self.rng
+        product_id = rng.choice(self.product_ids)
+        self.request('home', 'get', '/')
+        self.request('category', 'get', rng.choice(list(CATEGORY_URLS.values())))
+        self.request('search', 'get', '/search/', {'q': rng.choice(self.words)})
+        self.request('product-detail', 'get', f'/product-detail/{product_id}')
+        self.request('add-to-cart', 'get', '/cart/', {'product_id': product_id})
+        cart_id = Cart.objects.filter(user=self.user, product_id=product_id).values_list('id', flat=True).first()
+        self.request('cart-update-api', 'post', '/api/cart/update/', {'cart_id': cart_id or '', 'action': 'inc'})
+        self.request('checkout', 'get', '/checkout/')
+        self.request('payment-done', 'post', '/paymentdone/', {'custid': self.customer_id, 'payment_method': 'COD'})
+        tracking = Order.objects.filter(user=self.user).values_list('tracking_id', flat=True).last()
+        self.request('track-order', 'get', '/trackorder/', {'tracking_id': tracking or ''})
+
+
+def run_worker(user_id, words, journeys, seed_value):
+    """Run ``journeys`` journeys as ``user_id``; returns the step samples.
+
+    Module level so it can be sent to a process pool. Each thread or process
+    opens (and closes) its own database connection.
+    """
+    try:
+        journey = Journey(user_id, words, seed_value)
+        for _ in range(journeys):
+            journey.run()
+        return journey.samples
+    finally:
+        connections.close_all()
+
+
+def histogram(timings):
+    counts = [0] * (len(HISTOGRAM_MS) + 1)
+    for seconds in timings:
+        ms = seconds * 1000
+        counts[next((i for i, bound in enumerate(HISTOGRAM_MS) if ms < bound), len(HISTOGRAM_MS))] += 1
+    return counts
+
+
+def summarize_run(samples, wall_time, journeys):
+    """Throughput plus per-step latency percentiles, histogram and queries."""
+    by_step = defaultdict(list)
+    for step, seconds, queries, status in samples:
+        by_step[step].append((seconds, queries, status))
+    steps = {}
+    checkouts = sum(1 for row in by_step['payment-done'] if row[2] < 400)
+    for step in STEPS:
+        rows = by_step.get(step, [])
+        if not rows:
+            continue
+        timings = sorted(row[0] for row in rows)
+        queries = [row[1] for row in rows]
+        steps[step] = {
+            'count': len(rows),
+            'errors': sum(1 for row in rows if row[2] >= 500),
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'histogram': histogram(timings),
+        }
+    return {
+        'journeys': journeys,
+        'wall_s': round(wall_time, 3),
+        'journeys_per_s': round(journeys / wall_time, 2),
+        'checkouts_per_s': round(checkouts / wall_time, 2),
+        'errors': sum(stats['errors'] for stats in steps.values()),
+        'requests_per_s': round(len(samples) / wall_time, 2),
+        'steps': steps,
+    }
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
@@ -0,0 +1,176 @@
+import asyncio
+import io
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+
+from app.bench import benchmark_database
+from app.instrumentation import percentile
+from app.models import Order, Product
+
+
+class PeakThreads:
+    def __init__(self):
+        self.peak = threading.active_count()
+
+    def sample(self):
+        self.peak = max(self.peak, threading.active_count())
+
+
+class Command(BaseCommand):
+    help = (
+        'Send the same burst of simultaneous catalogue, search and tracking requests '
+        'to the sync WSGI handler (behind a fixed thread pool) and to the async ASGI handler.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000,
+                            help='Requests in flight at once.')
+        parser.add_argument('--threads', type=int, default=32,
+                            help='Worker threads of the WSGI server.')
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Sleep this long in every query, to stand in for a database '
+                                 'on another host.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp, benchmark_database(os.path.join(tmp, 'bench.sqlite3')):
+            call_command('seed_data', products=options['products'], users=200, orders=2000, stdout=StringIO())
+            paths = self.paths()
+            connections.close_all()
+            latency = options['db_latency_ms'] / 1000
+            if latency:
+                connection_created.connect(self.add_latency(latency), weak=False, dispatch_uid='bench_asgi')
+            try:
+                self.stdout.write(
+                    f"{options['connections']} simultaneous requests, "
+                    f"db latency {options['db_latency_ms']:g} ms"
+                )
+                self.report(f"WSGI, {options['threads']} threads", self.run_wsgi(paths, options))
+                # what the ASGI deployment profile does (see settings.SERVER_INTERFACE)
+                max_age = connection.settings_dict['CONN_MAX_AGE']
+                connection.settings_dict['CONN_MAX_AGE'] = 0
+                try:
+                    self.report('ASGI, async views', asyncio.run(self.run_asgi(paths, options)))
+                finally:
+                    connection.settings_dict['CONN_MAX_AGE'] = max_age
+            finally:
+                connection_created.disconnect(dispatch_uid='bench_asgi')
+                connections.close_all()
+
+    def add_latency(self, seconds):
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def receiver(sender, connection, **kwargs):
+            # first in the list: execute_wrapper() pops the last one on exit
+            connection.execute_wrappers.insert(0, slow_execute)
+        return receiver
+
+    def paths(self):
+        """``(path, query string)`` pairs over the async read views."""
+        product_ids = list(Product.objects.values_list('id', flat=True)[:200])
+        tracking_ids = list(Order.objects.values_list('tracking_id', flat=True)[:200])
+        words = [title.split()[0].lower() for title in Product.objects.values_list('title', flat=True)[:200]]
+        mixes = [
+            [('/', '')],
+            [(f'/product-detail/{pk}', '') for pk in product_ids],
+            [(path, '') for path in ('/mobile/', '/laptops/', '/topwear/', '/bottomwear/', '/shoes/')],
+            [('/search/', f'q={word}') for word in words],
+            [('/trackorder/', f'tracking_id={tracking}') for tracking in tracking_ids],
+        ]
+        return [itertools.cycle(mix) for mix in mixes]
+
+    def requests(self, paths, count):
+        return [next(paths[i % len(paths)]) for i in range(count)]
+
+    def run_wsgi(self, paths, options):
+        handler = WSGIHandler()
+        threads = PeakThreads()
+
+        def call(path, query, start):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+            }
+            status = []
+            response = handler(environ, lambda line, headers: status.append(int(line[:3])))
+            for _ in response:  # consume the body like a server would
+                pass
+            response.close()
+            threads.sample()
+            return status[0], time.perf_counter() - start
+
+        call(*next(paths[0]), time.perf_counter())  # warm the home page cache
+        requests = self.requests(paths, options['connections'])
+        with ThreadPoolExecutor(options['threads']) as pool:
+            # every connection is open from the start; requests wait for a free thread
+            start = time.perf_counter()
+            jobs = [pool.submit(call, path, query, start) for path, query in requests]
+            results = [job.result() for job in jobs]
+            wall = time.perf_counter() - start
+        return results, wall, threads.peak
+
+    async def run_asgi(self, paths, options):
+        handler = ASGIHandler()
+        threads = PeakThreads()
+
+        async def call(path, query, start):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': query.encode(), 'root_path': '',
+                'headers': [(b'host', b'testserver')],
+                'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            body_sent = False
+            disconnected = asyncio.Event()
+            status = []
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnected.wait()  # the client stays connected
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                threads.sample()
+
+            await handler(scope, receive, send)
+            return status[0], time.perf_counter() - start
+
+        await call(*next(paths[0]), time.perf_counter())
+        requests = self.requests(paths, options['connections'])
+        start = time.perf_counter()
+        results = await asyncio.gather(*(call(path, query, start) for path, query in requests))
+        return results, time.perf_counter() - start, threads.peak
+
+    def report(self, label, run):
+        results, wall, peak_threads = run
+        timings = sorted(seconds for _, seconds in results)
+        errors = sum(1 for status, _ in results if status >= 500)
+        self.stdout.write(
+            f'{label:>20}: {len(results) / wall:8.1f} req/s  '
+            f'p50 {percentile(timings, 0.50) * 1000:8.1f} ms  '
+            f'p95 {percentile(timings, 0.95) * 1000:8.1f} ms  '
+            f'p99 {percentile(timings, 0.99) * 1000:8.1f} ms  '
+            f'errors {errors}  peak threads {peak_threads}'
+        )
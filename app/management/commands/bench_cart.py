@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from app.bench import benchmark_database, summarize, time_calls
+from app.instrumentation import QueryCounter
+from app.models import Cart, Product
+from app.pricing import cart_summary, line_summary
+
+
+def legacy_api_totals(user, cart_id):
+    """What cart_update_api used to do after changing a quantity."""
+    amount = 0
+    for item in Cart.objects.filter(user=user).select_related('product'):
+        amount += item.quantity * item.product.discounted_price
+    item = Cart.objects.select_related('product').get(id=cart_id, user=user)
+    return amount, item.quantity * item.product.discounted_price
+
+
+class Command(BaseCommand):
+    help = 'Benchmark cart pricing (SQL aggregates vs Python loops) on a large cart.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = User.objects.create_user('bench')
+            products = Product.objects.bulk_create([
+                Product(
+                    title=f'Product {i}', selling_price=2000, discounted_price=500 + i,
+                    description='Benchmark product', brand='Brand', category='M',
+                    product_image='productimg/bench.jpg',
+                )
+                for i in range(options['lines'])
+            ])
+            lines = Cart.objects.bulk_create([
+                Cart(user=user, product=p, quantity=1 + i % 3) for i, p in enumerate(products)
+            ])
+            cart_id = lines[len(lines) // 2].id
+
+            cases = [
+                ('legacy api loop', lambda: legacy_api_totals(user, cart_id)),
+                ('line_summary', lambda: line_summary(user, cart_id)),
+                ('cart_summary', lambda: cart_summary(user)),
+            ]
+            results = []
+            for label, func in cases:
+                with QueryCounter() as qc:
+                    func()
+                results.append((label, qc.count, summarize(time_calls(func, options['repeat']))))
+
+        self.stdout.write(f"cart lines: {options['lines']}")
+        for label, queries, stats in results:
+            self.stdout.write(
+                f"{label:>16}: {queries} queries  p50 {stats['p50_ms']:.2f} ms  "
+                f"p95 {stats['p95_ms']:.2f} ms"
+            )
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from app import exports
+from app.bench import benchmark_database
+from app.models import Order
+
+
+def peak_memory(func):
+    """Peak Python allocations (bytes) while ``func`` runs."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream an order export as CSV and JSONL through StreamingHttpResponse and '
+        'check that peak memory does not grow with the number of rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows per cursor read, instead of settings.EXPORT_CHUNK_SIZE.')
+
+    def handle(self, *args, **options):
+        count = options['orders']
+        chunk_size = options['chunk_size'] or settings.EXPORT_CHUNK_SIZE
+        with tempfile.TemporaryDirectory() as tmp, benchmark_database(os.path.join(tmp, 'bench.sqlite3')), \
+                override_settings(EXPORT_CHUNK_SIZE=chunk_size):
+            started = time.perf_counter()
+            call_command('seed_data', products=2000, users=5000, orders=count, max_lines=1,
+                         cart_lines=0, stdout=StringIO())
+            self.stdout.write(
+                f'seeded {count:,} orders in {time.perf_counter() - started:.1f} s, chunk size {chunk_size}'
+            )
+            export = exports.EXPORTS['orders']
+
+            def consume(queryset=None, fmt='csv'):
+                # the same path as the admin action, minus the socket
+                response = exports.streaming_response('orders', queryset, fmt)
+                return sum(len(chunk) for chunk in response.streaming_content)
+
+            for fmt in exports.FORMATS:
+                start = time.perf_counter()
+                size = consume(fmt=fmt)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{fmt:>6}: {count / elapsed:10,.0f} rows/s  {size / elapsed / 2**20:6.1f} MB/s  '
+                    f'{size / 2**20:7.1f} MB in {elapsed:.1f} s'
+                )
+
+            tenth = Order.objects.filter(id__lte=Order.objects.order_by('id')[count // 10 - 1].id)
+            self.stdout.write('peak Python memory (tracemalloc):')
+            for label, queryset in ((f'{count // 10:,} rows', tenth), (f'{count:,} rows', None)):
+                peak = peak_memory(lambda: consume(queryset))
+                self.stdout.write(f'  streamed {label:>14}: {peak / 2**20:7.1f} MB')
+            lookups = [lookup for _, lookup in export.columns]
+            peak = peak_memory(lambda: list(tenth.values_list(*lookups)))
+            self.stdout.write(f"  list()   {f'{count // 10:,} rows':>14}: {peak / 2**20:7.1f} MB")
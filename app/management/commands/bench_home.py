@@ -0,0 +1,56 @@
+import random
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from app.bench import benchmark_database, summarize, time_calls
+from app.models import CATEGORY_CHOICES, Product
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the home page with and without the fragment cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            categories = [code for code, _ in CATEGORY_CHOICES]
+            rng = random.Random(0)
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        title=f'Product {i}',
+                        selling_price=2000,
+                        discounted_price=rng.randint(500, 1999),
+                        description='Benchmark product',
+                        brand='Brand',
+                        category=categories[i % len(categories)],
+                        product_image='productimg/bench.jpg',
+                    )
+                    for i in range(options['products'])
+                ],
+                batch_size=1000,
+            )
+            client = Client()
+
+            def cold():
+                cache.clear()
+                client.get('/')
+
+            def warm():
+                client.get('/')
+
+            client.get('/')  # warm up templates and URL resolver
+            before = summarize(time_calls(cold, options['requests']))
+            client.get('/')
+            after = summarize(time_calls(warm, options['requests']))
+
+        self.stdout.write(f"products: {options['products']}")
+        for label, stats in (('uncached', before), ('cached', after)):
+            self.stdout.write(
+                f"{label:>9}: {stats['rps']:8.1f} req/s  "
+                f"p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms"
+            )
@@ -0,0 +1,82 @@
+import itertools
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views import static
+
+from app.bench import summarize, time_calls
+from app.media import serve_media
+
+
+class Command(BaseCommand):
+    help = 'Compare media serving throughput: django.views.static vs app.media.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--large-mb', type=int, default=5,
+                            help='Size of the extra large file fetched in the range test.')
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        try:
+            # real product images plus one large file, in a scratch MEDIA_ROOT
+            shutil.copytree(os.path.join(settings.MEDIA_ROOT, 'productimg'),
+                            os.path.join(media_root, 'productimg'))
+            with open(os.path.join(media_root, 'large.bin'), 'wb') as fh:
+                fh.write(os.urandom(options['large_mb'] * 1024 * 1024))
+            with override_settings(MEDIA_ROOT=media_root, MEDIA_SERVE_MODE='django'):
+                self.run(media_root, options['requests'])
+        finally:
+            shutil.rmtree(media_root)
+
+    def run(self, media_root, requests):
+        factory = RequestFactory()
+        names = sorted(
+            f'productimg/{name}' for name in os.listdir(os.path.join(media_root, 'productimg'))
+        )
+        first = serve_media(factory.get('/'), names[0])
+        etag, last_modified = first['ETag'], first['Last-Modified']
+        first.close()
+
+        def fetch(view, paths, **headers):
+            paths = itertools.cycle(paths)
+
+            def call():
+                response = view(factory.get('/', **headers), next(paths))
+                for _ in response:  # consume the body like a server would
+                    pass
+                response.close()
+            return call
+
+        def old(request, path):
+            return static.serve(request, path, document_root=media_root)
+
+        large = max(1, requests // 20)
+        cases = [
+            ('static.serve, full', fetch(old, names), requests),
+            ('serve_media, full', fetch(serve_media, names), requests),
+            ('static.serve, If-Modified-Since',
+             fetch(old, names[:1], HTTP_IF_MODIFIED_SINCE=last_modified), requests),
+            ('serve_media, If-None-Match',
+             fetch(serve_media, names[:1], HTTP_IF_NONE_MATCH=etag), requests),
+            # static.serve ignores Range and always sends the whole file
+            ('static.serve, first 64 KiB of large', fetch(old, ['large.bin'], HTTP_RANGE='bytes=0-65535'), large),
+            ('serve_media, first 64 KiB of large',
+             fetch(serve_media, ['large.bin'], HTTP_RANGE='bytes=0-65535'), large),
+        ]
+
+        self.stdout.write(f'{len(names)} product images, {requests} requests per case')
+        for label, call, count in cases:
+            self.report(label, summarize(time_calls(call, count)))
+        with override_settings(MEDIA_SERVE_MODE='x-accel-redirect'):
+            self.report('serve_media, X-Accel-Redirect', summarize(time_calls(fetch(serve_media, names), requests)))
+
+    def report(self, label, stats):
+        self.stdout.write(
+            f"{label:>36}: {stats['rps']:9.1f} req/s  "
+            f"p50 {stats['p50_ms']:.3f} ms  p95 {stats['p95_ms']:.3f} ms"
+        )
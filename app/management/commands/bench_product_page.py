@@ -0,0 +1,70 @@
+import random
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from app import product_page
+from app.bench import benchmark_database, summarize, time_calls
+from app.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Browse product detail pages like returning visitors (popular products, '
+        'a browser cache that revalidates) and report how many hits needed no template.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--visitors', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        title=f'Product {i}', selling_price=2000, discounted_price=500 + i % 1500,
+                        description='Benchmark product', brand='Brand', category='M',
+                        product_image='productimg/bench.jpg',
+                    )
+                    for i in range(options['products'])
+                ],
+                batch_size=1000,
+            )
+            ids = list(Product.objects.values_list('id', flat=True))
+            rng = random.Random(0)
+            # a few products get most of the traffic
+            weights = [1 / (rank + 1) for rank in range(len(ids))]
+            visitors = [(Client(), {}) for _ in range(options['visitors'])]
+
+            def visit():
+                client, etags = rng.choice(visitors)
+                url = f'/product-detail/{rng.choices(ids, weights)[0]}'
+                headers = {'HTTP_IF_NONE_MATCH': etags[url]} if url in etags else {}
+                response = client.get(url, **headers)
+                etags[url] = response['ETag']
+
+            def uncached():
+                cache.clear()
+                client, _ = visitors[0]
+                client.get(f'/product-detail/{rng.choice(ids)}')
+
+            visit()  # warm up templates and URL resolver
+            baseline = summarize(time_calls(uncached, max(1, options['requests'] // 10)))
+            cache.clear()
+            product_page.hits.reset()
+            browsing = summarize(time_calls(visit, options['requests']))
+            hits = product_page.hits.snapshot()
+
+        self.stdout.write(f"{options['products']} products, {options['visitors']} visitors")
+        for label, stats in (('always rendered', baseline), ('browsing', browsing)):
+            self.stdout.write(
+                f"{label:>16}: {stats['rps']:8.1f} req/s  "
+                f"p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms"
+            )
+        self.stdout.write(
+            f"304 {hits.get('not_modified', 0)}, page cache {hits.get('cached', 0)}, "
+            f"rendered {hits.get('rendered', 0)}: {hits['without_templates']:.1%} without templates"
+        )
@@ -0,0 +1,75 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from app import search
+from app.bench import benchmark_database, make_vocabulary, summarize, time_calls
+from app.models import CATEGORY_CHOICES, Product
+
+BRANDS = ['SAMSUNG', 'REDMI', 'HP', 'DELL', 'KNCHDE', 'MYNOT', 'NIKE', 'LEVIS']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark full-text product search against icontains scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--vocabulary', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        categories = [code for code, _ in CATEGORY_CHOICES]
+        words = make_vocabulary(rng, options['vocabulary'])
+        with benchmark_database():
+            batch = []
+            for i in range(options['products']):
+                brand = rng.choice(BRANDS)
+                batch.append(Product(
+                    title=f"{brand.title()} {' '.join(rng.sample(words, 3))} {i}",
+                    selling_price=2000,
+                    discounted_price=rng.randint(500, 1999),
+                    description=' '.join(rng.choices(words, k=20)),
+                    brand=brand,
+                    category=rng.choice(categories),
+                    product_image='productimg/bench.jpg',
+                ))
+                if len(batch) == 5000:
+                    Product.objects.bulk_create(batch)
+                    batch = []
+            Product.objects.bulk_create(batch)
+            search.rebuild_index()
+
+            # two-word queries, each word possibly truncated to a prefix
+            vocabulary = words + [brand.lower() for brand in BRANDS]
+            terms = [
+                ' '.join(w[:rng.randint(min(3, len(w)), len(w))] for w in rng.sample(vocabulary, 2))
+                for _ in range(options['queries'])
+            ]
+            queries = iter(terms)
+
+            def run():
+                search.search_products(next(queries))
+
+            fts = summarize(time_calls(run, len(terms)))
+
+            scans = iter(terms)
+
+            def scan():
+                # what the old view did: count the matches, then render them
+                q = next(scans).split()[0]
+                qs = Product.objects.filter(
+                    Q(title__icontains=q) | Q(brand__icontains=q) | Q(description__icontains=q)
+                )
+                qs.count()
+                list(qs[:24])
+
+            like = summarize(time_calls(scan, min(len(terms), 20)))
+
+        self.stdout.write(f"products: {options['products']}")
+        for label, stats in (('fts5', fts), ('icontains', like)):
+            self.stdout.write(
+                f"{label:>9}: p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms  "
+                f"p99 {stats['p99_ms']:.2f} ms"
+            )
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from app import cart
+from app.bench import benchmark_database
+from app.checkout import place_order
+from app.db import current_pragmas
+from app.models import Customer, Product
+
+
+def writer(user_id, seconds):
+    """Add to cart and check out in a loop; returns (checkouts, lock errors)."""
+    user = User.objects.get(pk=user_id)
+    customer = Customer.objects.get(user=user)
+    products = list(Product.objects.all()[:20])
+    done = errors = i = 0
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            try:
+                cart.add_product(user, products[i % len(products)])
+                place_order(user, customer, 'COD')
+                done += 1
+            except OperationalError:
+                errors += 1
+            i += 1
+        return done, errors
+    finally:
+        connections.close_all()
+
+
+def reader(seconds):
+    """Read listing pages in a loop; returns (reads, lock errors)."""
+    done = errors = 0
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            try:
+                list(Product.objects.filter(category='M').order_by('discounted_price')[:24])
+                done += 1
+            except OperationalError:
+                errors += 1
+        return done, errors
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Compare checkout writes/sec across SQLite profiles with several worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--profiles', nargs='+', default=list(settings.SQLITE_PROFILES))
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['writers']} writer / {options['readers']} reader processes, "
+            f"{options['seconds']:.0f} s per profile"
+        )
+        for profile in options['profiles']:
+            self.run_profile(profile, options)
+
+    def run_profile(self, profile, options):
+        saved_options = connection.settings_dict['OPTIONS']
+        connection.settings_dict['OPTIONS'] = dict(settings.SQLITE_PROFILES[profile]['options'])
+        try:
+            with override_settings(DATABASE_PROFILE=profile), tempfile.TemporaryDirectory() as tmp:
+                with benchmark_database(os.path.join(tmp, 'bench.sqlite3')):
+                    user_ids = self.seed(options['writers'])
+                    pragmas = current_pragmas(connection)
+                    connections.close_all()  # forked workers open their own
+                    seconds = options['seconds']
+                    context = multiprocessing.get_context('fork')
+                    with ProcessPoolExecutor(options['writers'] + options['readers'], mp_context=context) as pool:
+                        writes = [pool.submit(writer, user_id, seconds) for user_id in user_ids]
+                        reads = [pool.submit(reader, seconds) for _ in range(options['readers'])]
+                        write_results = [job.result() for job in writes]
+                        read_results = [job.result() for job in reads]
+        finally:
+            connection.settings_dict['OPTIONS'] = saved_options
+
+        checkouts = sum(done for done, _ in write_results)
+        self.stdout.write(
+            f"{profile:>8}: {checkouts / seconds:8.1f} checkouts/s  "
+            f"{sum(done for done, _ in read_results) / seconds:9.1f} reads/s  "
+            f"lock errors {sum(e for _, e in write_results + read_results)}  "
+            f"(journal_mode={pragmas['journal_mode']}, synchronous={pragmas['synchronous']})"
+        )
+
+    def seed(self, writers):
+        Product.objects.bulk_create([
+            Product(
+                title=f'Product {i}', selling_price=2000, discounted_price=500 + i,
+                description='Benchmark product', brand='Brand', category='M',
+                product_image='productimg/bench.jpg',
+            )
+            for i in range(2000)
+        ])
+        users = User.objects.bulk_create([User(username=f'writer{i}') for i in range(writers)])
+        Customer.objects.bulk_create([
+            Customer(user=user, name=user.username, locality='Street', city='City',
+                     zipcode=54000, state='Punjab')
+            for user in users
+        ])
+        return [user.pk for user in users]
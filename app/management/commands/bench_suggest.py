@@ -0,0 +1,45 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.bench import make_vocabulary, summarize, time_calls
+from app.suggest import SuggestIndex
+
+BRANDS = ['SAMSUNG', 'REDMI', 'HP', 'DELL', 'KNCHDE', 'MYNOT', 'NIKE', 'LEVIS']
+
+
+class Command(BaseCommand):
+    help = 'Measure build time and lookup latency of the search-as-you-type index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200000)
+        parser.add_argument('--queries', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        words = make_vocabulary(rng, 20000)
+        index = SuggestIndex()
+
+        # fed directly so the numbers measure the index, not the database
+        start = time.perf_counter()
+        for pk in range(1, options['products'] + 1):
+            index._add(pk, ' '.join(rng.sample(words, 3)), rng.choice(BRANDS))
+        index.ready = True
+        build = time.perf_counter() - start
+
+        queries = iter([
+            rng.choice(words)[:rng.randint(3, 6)] for _ in range(options['queries'])
+        ])
+        stats = summarize(time_calls(lambda: index.suggest(next(queries)), options['queries']))
+
+        postings = sum(len(slots) for slots in index.postings.values())
+        self.stdout.write(f"products: {options['products']}  build: {build:.2f} s")
+        self.stdout.write(
+            f"trigrams: {len(index.postings)}  postings: {postings} "
+            f"(~{postings * 4 / 1e6:.1f} MB in arrays)"
+        )
+        self.stdout.write(
+            f"suggest: p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms  "
+            f"p99 {stats['p99_ms']:.2f} ms"
+        )
@@ -0,0 +1,97 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app import home_cache, images
+from app.models import Product
+
+
+def build(media_root, name, widths):
+    # runs in a worker process; errors are reported back rather than raised
+    try:
+        return name, images.build_derivatives(media_root, name, widths), None
+    except (OSError, ValueError) as exc:
+        return name, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Build resized WebP/AVIF/original-format copies of product images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes to resize images with (default: all cores).')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild products whose derivatives are already up to date.')
+        parser.add_argument('--report', action='store_true',
+                            help='Print image bytes per home page before/after.')
+        parser.add_argument('--report-width', type=int, default=400,
+                            help='Rendered width (px) the report assumes, e.g. 200px at 2x DPR.')
+
+    def handle(self, *args, **options):
+        products = [
+            p for p in Product.objects.exclude(product_image='').only('id', 'product_image', 'image_variants')
+            if options['force'] or images.needs_derivatives(p)
+        ]
+        # one job per distinct file; products sharing an image share its copies
+        by_name = {}
+        for product in products:
+            by_name.setdefault(product.product_image.name, []).append(product)
+
+        if by_name:
+            self.stdout.write(f'Building derivatives for {len(by_name)} images '
+                              f'with {options["workers"]} workers...')
+            media_root = str(settings.MEDIA_ROOT)
+            widths = settings.IMAGE_DERIVATIVE_WIDTHS
+            failed = 0
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                jobs = [pool.submit(build, media_root, name, widths) for name in by_name]
+                for job in as_completed(jobs):
+                    name, data, error = job.result()
+                    if error:
+                        failed += 1
+                        self.stderr.write(f'{name}: {error}')
+                        continue
+                    for product in by_name[name]:
+                        product.image_variants = data
+            updated = [p for p in products if p.image_variants.get('source') == p.product_image.name]
+            Product.objects.bulk_update(updated, ['image_variants'], batch_size=500)
+            home_cache.invalidate()
+            self.stdout.write(self.style.SUCCESS(f'Updated {len(updated)} products, {failed} images failed.'))
+        else:
+            self.stdout.write('All product images are up to date.')
+
+        if options['report']:
+            self.report(options['report_width'])
+
+    def report(self, width):
+        """Bytes of product images one home page view downloads, before/after."""
+        categories = [section['category'] for section in home_cache.HOME_SECTIONS]
+        media_root = str(settings.MEDIA_ROOT)
+        before = after = count = 0
+        for product in Product.objects.filter(category__in=categories).exclude(product_image=''):
+            original = os.path.join(media_root, product.product_image.name)
+            if not os.path.exists(original):
+                continue
+            count += 1
+            size = os.path.getsize(original)
+            before += size
+            after += self.variant_size(media_root, product, width) or size
+        saved = 100 * (1 - after / before) if before else 0
+        self.stdout.write(
+            f'Home page images ({count} products): '
+            f'{before / 1024:.1f} KiB originals -> {after / 1024:.1f} KiB derivatives '
+            f'({saved:.0f}% smaller, WebP at {width}px)'
+        )
+
+    @staticmethod
+    def variant_size(media_root, product, width):
+        # what a browser picks from srcset: smallest copy at least `width` wide
+        webp = (product.image_variants or {}).get('variants', {}).get('webp')
+        if not webp:
+            return None
+        widths = sorted(int(w) for w in webp)
+        chosen = next((w for w in widths if w >= width), widths[-1])
+        path = os.path.join(media_root, webp[str(chosen)])
+        return os.path.getsize(path) if os.path.exists(path) else None
@@ -0,0 +1,143 @@
+import sys
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from app.bench import benchmark_database
+from app.models import Cart, Customer, Order, Product
+
+# (label, method, url, data) - every view that reads or writes rows; values
+# in {braces} are filled from the seeded data
+REQUESTS = [
+    ('home', 'get', '/', {}),
+    ('product-detail', 'get', '/product-detail/{product}', {}),
+    ('category', 'get', '/mobile/', {}),
+    ('category brand', 'get', '/mobile/{brand}', {}),
+    ('category price', 'get', '/topwear/below/', {}),
+    ('category next page', 'get', '/laptops/', {'after': '{cursor}'}),
+    ('search', 'get', '/search/', {'q': '{word}'}),
+    ('search suggest', 'get', '/api/search/suggest/', {'q': '{word}'}),
+    ('cart', 'get', '/cart/', {}),
+    ('add to cart', 'get', '/cart/', {'product_id': '{product}'}),
+    ('cart api', 'post', '/api/cart/update/', {'cart_id': '{cart}', 'action': 'inc'}),
+    ('cart quantity', 'get', '/cart/update/{cart}/dec/', {}),
+    ('buy now', 'get', '/buy/', {'product_id': '{product}'}),
+    ('checkout', 'get', '/checkout/', {}),
+    ('payment', 'post', '/paymentdone/', {'custid': '{customer}'}),
+    ('orders', 'get', '/orders/', {}),
+    ('track order', 'get', '/trackorder/', {'tracking_id': '{tracking}'}),
+    ('cancel order', 'post', '/order/cancel/{order}/', {}),
+    ('return order', 'post', '/order/return/{order}/', {}),
+    ('address', 'get', '/address/', {}),
+    ('profile', 'get', '/profile/', {}),
+    ('forgot password', 'post', '/forgot-password/', {'identifier': '{email}'}),
+]
+# statements (matched on a piece of their SQL) whose scan or sort is by design
+ACCEPTED = [
+    ('app_product_fts MATCH', 'FTS5 ranks the hits with bm25(); there is no index for that'),
+    ('FROM "app_product" ORDER BY 1', 'the suggest index loads every title once per process'),
+    ('OVER ()', 'the cart subtotal window sorts the lines of a single cart'),
+]
+
+
+class Collector:
+    """execute_wrapper that keeps every distinct SELECT/UPDATE/DELETE with its params."""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        verb = sql.lstrip().split(None, 1)[0].upper()
+        if not many and verb in ('SELECT', 'UPDATE', 'DELETE'):
+            self.statements.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+
+def scan_problems(sql, plan):
+    """Plan lines that read a whole table or sort without an index."""
+    if any(marker in sql for marker, _ in ACCEPTED):
+        return []
+    problems = []
+    for line in plan:
+        # "SCAN (subquery-1)" reads an intermediate result, not a table
+        if line.startswith('SCAN ') and ' USING ' not in line and not line.startswith('SCAN (subquery'):
+            problems.append(line)
+        elif 'USE TEMP B-TREE' in line:
+            problems.append(line)
+    return problems
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN QUERY PLAN on every query the views issue and flag full scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan.')
+        parser.add_argument('--strict', action='store_true', help='Exit with status 1 on findings.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('explain_audit reads SQLite query plans.')
+        with benchmark_database():
+            call_command(
+                'seed_data', products=options['products'], users=options['users'],
+                orders=options['orders'], stdout=StringIO(),
+            )
+            connection.cursor().execute('ANALYZE')
+            findings = self.audit(options['verbose_plans'])
+
+        total = sum(len(problems) for _, problems in findings)
+        for label, problems in findings:
+            for sql, lines in problems:
+                self.stdout.write(self.style.WARNING(f'[{label}] {" | ".join(lines)}'))
+                self.stdout.write(f'    {sql[:300]}')
+        if total:
+            self.stdout.write(self.style.WARNING(f'{total} queries scan a table or sort without an index.'))
+            if options['strict']:
+                sys.exit(1)
+        else:
+            self.stdout.write(self.style.SUCCESS('No full-table scans.'))
+
+    def audit(self, verbose):
+        user = User.objects.filter(order__isnull=False).first()
+        product = Product.objects.filter(category='M').first()
+        order = Order.objects.filter(user=user).first()
+        values = {
+            'product': product.pk,
+            'brand': product.brand,
+            'word': product.title.split()[0].lower(),
+            'cursor': f'{Product.objects.filter(category="L").order_by("discounted_price", "id")[23].discounted_price}_1',
+            'customer': Customer.objects.filter(user=user).first().pk,
+            'tracking': order.tracking_id,
+            'order': order.pk,
+            'email': user.email,
+        }
+        client = Client()
+        client.force_login(user)
+
+        findings = []
+        for label, method, url, data in REQUESTS:
+            # cart ids change as the requests add and check out lines
+            cart = Cart.objects.filter(user=user).first() or Cart.objects.create(user=user, product=product)
+            values['cart'] = cart.pk
+            collector = Collector()
+            with connection.execute_wrapper(collector):
+                getattr(client, method)(url.format(**values), {k: v.format(**values) for k, v in data.items()})
+
+            problems = []
+            for sql, params in collector.statements.items():
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                    plan = [row[3] for row in cursor.fetchall()]
+                if verbose:
+                    self.stdout.write(f'[{label}] {sql[:200]}\n    ' + '\n    '.join(plan))
+                if bad := scan_problems(sql, plan):
+                    problems.append((sql, bad))
+            findings.append((label, problems))
+        return findings
@@ -0,0 +1,39 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream every order, product or customer as CSV or JSONL, in constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS),
+                            help='Defaults to the output extension, csv for stdout.')
+        parser.add_argument('--output', default='-', help="File to write, '-' for stdout.")
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per cursor read.')
+
+    def handle(self, *args, **options):
+        path = options['output']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        try:
+            out = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(exc)
+        start = time.perf_counter()
+        written = 0
+        try:
+            for block in exports.stream(exports.EXPORTS[options['export']], fmt=fmt,
+                                        chunk_size=options['chunk_size']):
+                out.write(block)
+                written += len(block)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if path != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f"{options['export']} -> {path}: {written:,} characters in {time.perf_counter() - start:.2f} s"
+            ))
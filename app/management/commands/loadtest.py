@@ -0,0 +1,119 @@
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.bench import benchmark_database
+from app.loadtest import HISTOGRAM_MS, STEPS, run_worker, seed, summarize_run, timed
+
+
+class Command(BaseCommand):
+    help = 'Drive storefront journeys (browse to checkout) in-process and report throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Simultaneous shoppers (threads or processes).')
+        parser.add_argument('--journeys', type=int, default=25,
+                            help='Journeys per shopper.')
+        parser.add_argument('--mode', choices=['threads', 'processes'], default='threads')
+        parser.add_argument('--save-baseline', metavar='PATH',
+                            help='Write the results as JSON for later --compare runs.')
+        parser.add_argument('--compare', metavar='PATH',
+                            help='Diff the results against a saved baseline.')
+
+    def handle(self, *args, **options):
+        concurrency, journeys = options['concurrency'], options['journeys']
+        with tempfile.TemporaryDirectory() as tmp:
+            # workers share a file database; the default test database is in memory
+            with benchmark_database(os.path.join(tmp, 'loadtest.sqlite3')):
+                words = seed(options['products'], concurrency, random.Random(0))
+                user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+                connections.close_all()  # forked workers must not share this handle
+
+                if options['mode'] == 'processes':
+                    pool = ProcessPoolExecutor(concurrency, mp_context=multiprocessing.get_context('fork'))
+                else:
+                    pool = ThreadPoolExecutor(concurrency)
+
+                def run():
+                    with pool:
+                        jobs = [
+                            pool.submit(run_worker, user_id, words, journeys, n)
+                            for n, user_id in enumerate(user_ids)
+                        ]
+                        return [sample for job in jobs for sample in job.result()]
+
+                # failures are counted per step; don't print a traceback for each
+                request_logger = logging.getLogger('django.request')
+                level = request_logger.level
+                request_logger.setLevel(logging.CRITICAL)
+                try:
+                    samples, wall_time = timed(run)
+                finally:
+                    request_logger.setLevel(level)
+
+        result = summarize_run(samples, wall_time, concurrency * journeys)
+        result['config'] = {key: options[key] for key in ('products', 'concurrency', 'journeys', 'mode')}
+        self.report(result)
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self.compare(json.load(fh), result)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as fh:
+                json.dump(result, fh, indent=2)
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}")
+
+    def report(self, result):
+        config = result['config']
+        self.stdout.write(
+            f"{config['mode']} x{config['concurrency']}, {result['journeys']} journeys, "
+            f"{config['products']} products, {result['wall_s']:.1f} s"
+        )
+        self.stdout.write(
+            f"throughput: {result['checkouts_per_s']:.1f} checkouts/s  "
+            f"{result['requests_per_s']:.1f} requests/s  {result['errors']} errors"
+        )
+        bounds = [f'<{ms}' for ms in HISTOGRAM_MS] + [f'>={HISTOGRAM_MS[-1]}']
+        self.stdout.write(
+            f"{'step':>16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>6}  "
+            + ' '.join(f'{b:>5}' for b in bounds)
+        )
+        for step in STEPS:
+            stats = result['steps'].get(step)
+            if stats is None:
+                continue
+            self.stdout.write(
+                f"{step:>16} {stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f} "
+                f"{stats['queries_mean']:8.1f} {stats['errors']:6d}  "
+                + ' '.join(f'{n:5d}' for n in stats['histogram'])
+            )
+
+    def compare(self, baseline, result):
+        def change(old, new):
+            return f'{new - old:+.2f} ({(new - old) / old * 100:+.0f}%)' if old else f'{new - old:+.2f}'
+
+        self.stdout.write('vs baseline:')
+        if baseline.get('config') != result['config']:
+            self.stdout.write(f"  (baseline ran with {baseline.get('config')})")
+        self.stdout.write(
+            f"{'checkouts/s':>16} {baseline['checkouts_per_s']:8.2f} -> {result['checkouts_per_s']:8.2f}  "
+            f"{change(baseline['checkouts_per_s'], result['checkouts_per_s'])}"
+        )
+        for step in STEPS:
+            old, new = baseline['steps'].get(step), result['steps'].get(step)
+            if not old or not new:
+                continue
+            self.stdout.write(
+                f"{step:>16} p95 {old['p95_ms']:8.2f} -> {new['p95_ms']:8.2f} ms  "
+                f"{change(old['p95_ms'], new['p95_ms'])}  "
+                f"queries {old['queries_mean']:.1f} -> {new['queries_mean']:.1f}"
+            )
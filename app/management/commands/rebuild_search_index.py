@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the Product table.'
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            self.stdout.write('Full-text index not used on this database backend; nothing to do.')
+            return
+        with transaction.atomic():
+            count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products.'))
@@ -0,0 +1,258 @@
+import os
+import random
+import time
+import uuid
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from app import home_cache, search, suggest
+from app.bench import make_vocabulary
+from app.pricing import order_amounts
+from app.models import (
+    CATEGORY_CHOICES, PAYMENT_CHOICES, STATE_CHOICES, Cart, Customer, Order, OrderEvent, OrderLine,
+    Product,
+)
+
+BRANDS = {
+    'M': ['Samsung', 'Redmi', 'Apple', 'Oppo', 'Vivo'],
+    'L': ['Dell', 'HP', 'Lenovo', 'Asus', 'Acer'],
+    'TW': ['Levis', 'Outfitters', 'Khaadi', 'Breakout'],
+    'BW': ['Levis', 'Denim', 'Outfitters', 'Cougar'],
+    'S': ['Nike', 'Adidas', 'Bata', 'Servis'],
+}
+CITIES = ['Lahore', 'Karachi', 'Islamabad', 'Peshawar', 'Quetta', 'Multan', 'Faisalabad']
+# older orders have mostly been delivered, recent ones are still moving
+OLD_STATUSES = (['Delivered'] * 17) + ['Cancel', 'Cancel', 'On The Way']
+RECENT_STATUSES = ['Pending', 'Accepted', 'Packed', 'On The Way', 'Delivered']
+HISTORY_DAYS = 730
+PLACEHOLDER_COLOURS = ['#d1495b', '#edae49', '#00798c', '#30638e', '#003d5b', '#8d96a3', '#66a182', '#2e4057']
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+
+
+@contextmanager
+def keep_ordered_dates():
+    # let bulk_create store the generated dates instead of "now"
+    field = Order._meta.get_field('ordered_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+@contextmanager
+def fast_sqlite():
+    """Skip fsyncs while loading; a crash mid-seed only loses seed data."""
+    # the pragma can't change inside a transaction (e.g. under tests)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        synchronous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous = {int(synchronous)}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Add a large, deterministic dataset (products, users with addresses, '
+        'carts and order history) to the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--max-lines', type=int, default=4,
+                            help='Order lines per order are 1..max-lines.')
+        parser.add_argument('--cart-lines', type=int, default=3,
+                            help='Average open cart lines per user.')
+        parser.add_argument('--images', type=int, default=0,
+                            help='Write this many placeholder images to media/productimg '
+                                 'and spread them over the products.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        images = self.write_images(options['images'], rng)
+        with fast_sqlite():
+            products = self.seed_products(options['products'], images, rng)
+            users = self.seed_users(options['users'], rng)
+            self.seed_carts(users, products, options['cart_lines'], rng)
+            with keep_ordered_dates():
+                self.seed_orders(options['orders'], options['max_lines'], users, products, rng)
+
+        # bulk_create skips the post_save signals that keep these in sync
+        with transaction.atomic():
+            search.rebuild_index()
+        suggest.index.reset()
+        home_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {time.perf_counter() - started:.1f} s. '
+            f'Run build_image_derivatives for the new products\' thumbnails.'
+        ))
+
+    def insert(self, model, rows):
+        """``bulk_create`` a generator of ``rows`` in batches, one transaction each."""
+        start = time.perf_counter()
+        done = 0
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            done += len(batch)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{model.__name__:>10}: {done:>9} rows in {elapsed:6.1f} s '
+            f'({done / elapsed if elapsed else 0:,.0f} rows/s)'
+        )
+        return done
+
+    def write_images(self, count, rng):
+        if not count:
+            return ['productimg/seed.jpg']
+        from PIL import Image, ImageDraw
+
+        directory = os.path.join(settings.MEDIA_ROOT, 'productimg')
+        os.makedirs(directory, exist_ok=True)
+        names = []
+        for i in range(count):
+            name = f'productimg/seed_{i:04d}.jpg'
+            image = Image.new('RGB', (600, 600), rng.choice(PLACEHOLDER_COLOURS))
+            ImageDraw.Draw(image).text((20, 20), f'#{i}', fill='white')
+            image.save(os.path.join(settings.MEDIA_ROOT, name), 'JPEG', quality=80)
+            names.append(name)
+        self.stdout.write(f'    images: {count:>9} written to {directory}')
+        return names
+
+    def seed_products(self, count, images, rng):
+        """Returns ``(first id, prices)`` so orders can price their lines."""
+        words = make_vocabulary(rng, 20000)
+        categories = [code for code, _ in CATEGORY_CHOICES]
+        first = next_id(Product)
+        prices = array('d')
+
+        def rows():
+            for i in range(count):
+                category = categories[i % len(categories)]
+                selling = rng.randint(10, 4000) * 10
+                discounted = round(selling * rng.uniform(0.6, 1.0))
+                prices.append(discounted)
+                yield Product(
+                    id=first + i,
+                    title=' '.join(rng.sample(words, 3)).title(),
+                    selling_price=selling,
+                    discounted_price=discounted,
+                    description=' '.join(rng.sample(words, 12)).capitalize() + '.',
+                    brand=rng.choice(BRANDS[category]),
+                    category=category,
+                    product_image=images[i % len(images)],
+                )
+
+        self.insert(Product, rows())
+        return first, prices
+
+    def seed_users(self, count, rng):
+        # one hash shared by every seeded user: they can all log in with "password"
+        password = make_password('password')
+        first_user, first_customer = next_id(User), next_id(Customer)
+        now = timezone.now()
+        states = [code for code, _ in STATE_CHOICES]
+        self.insert(User, (
+            User(id=first_user + i, username=f'seed{first_user + i}', password=password,
+                 email=f'seed{first_user + i}@example.com', date_joined=now)
+            for i in range(count)
+        ))
+        self.insert(Customer, (
+            Customer(
+                id=first_customer + i, user_id=first_user + i, name=f'Customer {first_user + i}',
+                locality=f'House {rng.randint(1, 999)}, Street {rng.randint(1, 99)}',
+                city=rng.choice(CITIES), zipcode=rng.randint(10000, 99999), state=rng.choice(states),
+            )
+            for i in range(count)
+        ))
+        return first_user, first_customer, count
+
+    def seed_carts(self, users, products, per_user, rng):
+        first_user, _, count = users
+        first_product, prices = products
+
+        def rows():
+            for u in range(count):
+                lines = rng.randint(0, per_user * 2)
+                for offset in rng.sample(range(len(prices)), min(lines, len(prices))):
+                    yield Cart(user_id=first_user + u, product_id=first_product + offset,
+                               quantity=rng.randint(1, 3))
+
+        self.insert(Cart, rows())
+
+    def seed_orders(self, count, max_lines, users, products, rng):
+        first_user, first_customer, user_count = users
+        started = time.perf_counter()
+        first_product, prices = products
+        first_order = next_id(Order)
+        payments = [code for code, _ in PAYMENT_CHOICES]
+        start = timezone.now() - timedelta(days=HISTORY_DAYS)
+        step = HISTORY_DAYS * 86400 / max(count, 1)
+        lines_total = 0
+
+        for batch_start in range(0, count, self.batch_size):
+            orders, lines, events = [], [], []
+            for i in range(batch_start, min(count, batch_start + self.batch_size)):
+                u = rng.randrange(user_count)
+                order_id = first_order + i
+                total = 0
+                for offset in rng.sample(range(len(prices)), min(rng.randint(1, max_lines), len(prices))):
+                    quantity = rng.randint(1, 3)
+                    lines.append(OrderLine(order_id=order_id, product_id=first_product + offset,
+                                           quantity=quantity, price=prices[offset]))
+                    total += quantity * prices[offset]
+                # dates grow with the id, like a real order history
+                ordered = start + timedelta(seconds=i * step + rng.uniform(0, step))
+                recent = i > count * 0.98
+                status = rng.choice(RECENT_STATUSES if recent else OLD_STATUSES)
+                orders.append(Order(
+                    id=order_id, user_id=first_user + u, customer_id=first_customer + u,
+                    ordered_date=ordered, status=status, status_changed_at=ordered,
+                    payment_method=rng.choice(payments),
+                    **order_amounts(total)._asdict(),
+                    tracking_id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                ))
+                events.append(OrderEvent(order_id=order_id, status=status, source='backfill', created_at=ordered))
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                OrderLine.objects.bulk_create(lines, batch_size=self.batch_size)
+                OrderEvent.objects.bulk_create(events)
+            lines_total += len(lines)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'     Order: {count:>9} rows + {lines_total} lines in {elapsed:6.1f} s '
+            f'({(count + lines_total) / elapsed if elapsed else 0:,.0f} rows/s)'
+        )
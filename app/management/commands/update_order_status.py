@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import order_status
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply warehouse status changes from a CSV (tracking_id,status header) '
+        'or JSONL file, in batched updates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Defaults to the file extension, csv for stdin.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        reader = order_status.read_jsonl if fmt == 'jsonl' else order_status.read_csv
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig', errors='replace')
+        except OSError as exc:
+            raise CommandError(exc)
+        with stream:
+            report = order_status.apply_status_updates(reader(stream), options['chunk_size'])
+
+        result = report.as_dict()
+        for row in result['rejected_rows']:
+            self.stdout.write(self.style.WARNING(
+                f"line {row['line']}: {row['tracking_id'] or '?'} -> {row['status']}: {row['reason']}"
+            ))
+        if result['rejected'] > len(result['rejected_rows']):
+            self.stdout.write(f"... {result['rejected'] - len(result['rejected_rows'])} more rejected rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rows']} rows in {result['seconds']:.2f} s ({result['rows_per_s'] or 0:,} rows/s): "
+            f"{result['applied']} applied to {result['orders_updated']} orders, "
+            f"{result['unchanged']} unchanged, {result['rejected']} rejected"
+        ))
+        for reason, count in sorted(result['rejected_by_reason'].items()):
+            self.stdout.write(f'    {reason}: {count}')
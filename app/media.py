@@ -0,0 +1,140 @@
+"""Serving uploaded media (product images) in production.
+
+``serve_media`` replaces ``django.conf.urls.static.static()``, which only
+works with ``DEBUG = True``. It handles:
+
+* conditional GET: ``ETag``/``If-None-Match`` and ``Last-Modified``/
+  ``If-Modified-Since`` answered with ``304``;
+* single byte ranges (``Range``/``If-Range``), answered with ``206`` or ``416``;
+* full responses through ``FileResponse``, so WSGI servers that provide
+  ``wsgi.file_wrapper`` can use ``sendfile()``;
+* ``MEDIA_SERVE_MODE = 'x-accel-redirect'`` (nginx) or ``'x-sendfile'``
+  (Apache/lighttpd), where Django only checks the request and the proxy
+  sends the bytes.
+"""
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """``(start, end)`` (inclusive) for a single-range ``Range`` header.
+
+    Returns None when the header should be ignored (absent, malformed or
+    several ranges: the full file is sent) and ``False`` when the range
+    cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+        if not int(last):
+            return False
+    if start >= size:
+        return False
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            block = fh.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Media file not found')
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404('Media file not found')
+    if not S_ISREG(stat.st_mode):
+        raise Http404('Media file not found')
+
+    etag = media_etag(stat)
+    last_modified = int(stat.st_mtime)
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        add_media_headers(conditional, etag, last_modified)
+        return conditional
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+
+    if mode == 'x-accel-redirect':
+        # nginx: an `internal` location aliased to MEDIA_ROOT does the rest;
+        # it URL-decodes the URI, so spaces and non-ASCII names are quoted
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + path)
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+    else:
+        byte_range = None
+        if request.method == 'GET' and if_range_matches(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.headers.get('Range', ''), stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                read_range(fullpath, start, length), status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    if encoding and 'Content-Encoding' not in response:
+        response['Content-Encoding'] = encoding
+    add_media_headers(response, etag, last_modified)
+    return response
+
+
+def add_media_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
@@ -0,0 +1,81 @@
+"""Per-request instrumentation.
+
+``RequestMetricsMiddleware`` times every request, counts its queries and
+their DB time on every alias and worker thread (``QueryCounter``), and
+then:
+
+* adds a ``Server-Timing`` header (``app``, ``db`` with the query count),
+  which browser dev tools show next to the request;
+* records the sample in ``metrics``, a rolling window per view served as
+  percentiles at ``/api/metrics/requests/`` (staff only);
+* checks the view against its query budget (``REQUEST_QUERY_BUDGETS``,
+  falling back to ``REQUEST_QUERY_BUDGET``). Over-budget requests are
+  logged, or raise ``QueryBudgetExceeded`` when
+  ``REQUEST_QUERY_BUDGET_RAISE`` is on, so test suites fail on N+1s.
+
+It works in both sync and async stacks, so async views under ASGI are not
+pushed onto a thread by it.
+"""
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import QueryCounter, RequestMetrics
+
+logger = logging.getLogger(__name__)
+
+metrics = RequestMetrics(window=settings.REQUEST_METRICS_WINDOW)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+def query_budget(view):
+    return settings.REQUEST_QUERY_BUDGETS.get(view, settings.REQUEST_QUERY_BUDGET)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryCounter() as qc:
+            response = self.get_response(request)
+        return self.finish(request, response, qc)
+
+    async def __acall__(self, request):
+        with QueryCounter() as qc:
+            response = await self.get_response(request)
+        return self.finish(request, response, qc)
+
+    def finish(self, request, response, qc):
+        view = view_label(request)
+        metrics.record(view, qc.elapsed, qc.count, qc.db_time)
+        response['Server-Timing'] = (
+            f'app;dur={qc.elapsed * 1000:.1f}, '
+            f'db;dur={qc.db_time * 1000:.1f};desc="{qc.count} queries"'
+        )
+
+        budget = query_budget(view)
+        if budget is not None and qc.count > budget:
+            message = f'{view} ran {qc.count} queries (budget {budget}) for {request.path}'
+            if settings.REQUEST_QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:29
+
+import uuid
+
+import app.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def split_orders(apps, schema_editor):
+    """Copy every legacy OrderPlaced row into an Order with one OrderLine.
+
+    Each legacy row already had its own tracking id, so it maps 1:1 onto an
+    order header; the line price is taken from the product's current price.
+    """
+    OrderPlaced = apps.get_model('app', 'OrderPlaced')
+    Order = apps.get_model('app', 'Order')
+    OrderLine = apps.get_model('app', 'OrderLine')
+
+    # keep the original order dates instead of stamping "now"
+    Order._meta.get_field('ordered_date').auto_now_add = False
+    legacy = OrderPlaced.objects.select_related('product').order_by('id')
+    for chunk in _chunks(legacy.iterator(chunk_size=1000), 1000):
+        orders = Order.objects.bulk_create([
+            Order(
+                user_id=op.user_id,
+                customer_id=op.customer_id,
+                ordered_date=op.ordered_date,
+                status=op.status,
+                payment_method=op.payment_method,
+                total=op.quantity * op.product.discounted_price,
+                tracking_id=op.tracking_id or str(uuid.uuid4()),
+            )
+            for op in chunk
+        ])
+        # bulk_create does not return pks on every backend; look them up
+        ids = dict(
+            Order.objects.filter(tracking_id__in=[o.tracking_id for o in orders])
+            .values_list('tracking_id', 'id')
+        )
+        OrderLine.objects.bulk_create([
+            OrderLine(
+                order_id=ids[order.tracking_id],
+                product_id=op.product_id,
+                quantity=op.quantity,
+                price=op.product.discounted_price,
+            )
+            for op, order in zip(chunk, orders)
+        ])
+
+
+def merge_orders(apps, schema_editor):
+    """Reverse of ``split_orders``: one OrderPlaced row per OrderLine."""
+    OrderPlaced = apps.get_model('app', 'OrderPlaced')
+    OrderLine = apps.get_model('app', 'OrderLine')
+
+    OrderPlaced._meta.get_field('ordered_date').auto_now_add = False
+    lines = OrderLine.objects.select_related('order').order_by('order_id', 'id')
+    last_order_id = None
+    for chunk in _chunks(lines.iterator(chunk_size=1000), 1000):
+        rows = []
+        for line in chunk:
+            # tracking ids were unique per row; only the first line keeps it
+            first = line.order_id != last_order_id
+            last_order_id = line.order_id
+            rows.append(OrderPlaced(
+                user_id=line.order.user_id,
+                customer_id=line.order.customer_id,
+                product_id=line.product_id,
+                quantity=line.quantity,
+                ordered_date=line.order.ordered_date,
+                status=line.order.status,
+                payment_method=line.order.payment_method,
+                tracking_id=line.order.tracking_id if first else None,
+            ))
+        OrderPlaced.objects.bulk_create(rows)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_orderplaced_tracking_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordered_date', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Accepted', 'Accepted'), ('Packed', 'Packed'), ('On The Way', 'On The Way'), ('Delivered', 'Delivered'), ('Cancel', 'Cancel')], default='Pending', max_length=50)),
+                ('payment_method', models.CharField(choices=[('COD', 'Cash on Delivery'), ('DEBIT', 'Debit / Credit Card'), ('JAZZCASH', 'JazzCash'), ('EASYPAISA', 'EasyPaisa'), ('SADAPAY', 'SadaPay')], default='COD', max_length=20)),
+                ('total', models.FloatField(default=0)),
+                ('tracking_id', models.CharField(default=app.models.new_tracking_id, max_length=36, unique=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.customer')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('price', models.FloatField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='app.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.product')),
+            ],
+        ),
+        migrations.RunPython(split_orders, merge_orders),
+        migrations.DeleteModel(
+            name='OrderPlaced',
+        ),
+    ]
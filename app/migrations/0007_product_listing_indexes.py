@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_order_orderline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'brand', 'discounted_price'], name='product_cat_brand_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'discounted_price'], name='product_cat_price_idx'),
+        ),
+    ]
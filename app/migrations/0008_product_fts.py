@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE app_product_fts USING fts5("
+        "title, brand, description, tokenize='unicode61', prefix='2 3')"
+    )
+    schema_editor.execute(
+        'INSERT INTO app_product_fts (rowid, title, brand, description) '
+        'SELECT id, title, brand, description FROM app_product'
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS app_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
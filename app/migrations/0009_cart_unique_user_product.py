@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Fold duplicate (user, product) cart rows into the oldest one."""
+    Cart = apps.get_model('app', 'Cart')
+    duplicates = (
+        Cart.objects.values('user_id', 'product_id')
+        .annotate(rows=Count('id'), keep=Min('id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for dup in duplicates:
+        Cart.objects.filter(id=dup['keep']).update(quantity=dup['total'])
+        Cart.objects.filter(
+            user_id=dup['user_id'], product_id=dup['product_id'],
+        ).exclude(id=dup['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_product_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_cart_user_product'),
+        ),
+    ]
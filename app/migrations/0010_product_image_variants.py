@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_cart_unique_user_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_product_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        # later auth migrations rebuild auth_user and would drop the email index
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        # forgot-password looks users up by email; auth_user has no index on it
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS app_auth_user_email_idx ON auth_user (email)',
+            'DROP INDEX IF EXISTS app_auth_user_email_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-ordered_date'], name='order_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'id'], name='product_cat_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
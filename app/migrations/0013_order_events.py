@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='status_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=50)),
+                ('source', models.CharField(choices=[('checkout', 'Checkout'), ('customer', 'Customer'), ('warehouse', 'Warehouse'), ('admin', 'Admin'), ('backfill', 'Backfill')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='app.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'created_at'], name='orderevent_order_time_idx')],
+            },
+        ),
+        # existing orders: one event for the status they have, dated at the order
+        migrations.RunSQL(
+            "INSERT INTO app_orderevent (order_id, status, source, created_at) "
+            "SELECT id, status, 'backfill', ordered_date FROM app_order",
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            'UPDATE app_order SET status_changed_at = ordered_date',
+            migrations.RunSQL.noop,
+        ),
+    ]
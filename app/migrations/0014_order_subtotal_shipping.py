@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_order_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shipping',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.FloatField(default=0),
+        ),
+        # existing orders keep the total they were charged; split it into the
+        # line subtotal and whatever shipping was added on top
+        migrations.RunSQL(
+            'UPDATE app_order SET subtotal = COALESCE('
+            '(SELECT SUM(quantity * price) FROM app_orderline WHERE order_id = app_order.id), total)',
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            'UPDATE app_order SET shipping = CASE WHEN total > subtotal '
+            'THEN ROUND(total - subtotal, 2) ELSE 0 END',
+            migrations.RunSQL.noop,
+        ),
+    ]
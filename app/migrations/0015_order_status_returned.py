@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_order_subtotal_shipping'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Accepted', 'Accepted'), ('Packed', 'Packed'), ('On The Way', 'On The Way'), ('Delivered', 'Delivered'), ('Cancel', 'Cancel'), ('Returned', 'Returned')], default='Pending', max_length=50),
+        ),
+        # the customer cancel view used to write 'Cancelled', outside the
+        # choices; order events are history and keep what was recorded
+        migrations.RunSQL(
+            "UPDATE app_order SET status = 'Cancel' WHERE status = 'Cancelled'",
+            migrations.RunSQL.noop,
+        ),
+    ]
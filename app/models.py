@@ -1,6 +1,9 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils import timezone
 
 # -------------------------------
 # ✅ State Choices
@@ -49,6 +52,19 @@ class Product(models.Model):
     brand = models.CharField(max_length=100)
     category = models.CharField(choices=CATEGORY_CHOICES, max_length=2)
     product_image = models.ImageField(upload_to='productimg')
+    # Resized copies of product_image, filled in by app/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Versions the cached detail page and its ETag/Last-Modified (app/product_page.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # category listing pages: brand facets and keyset pagination on price
+            models.Index(fields=['category', 'brand', 'discounted_price'], name='product_cat_brand_price_idx'),
+            models.Index(fields=['category', 'discounted_price'], name='product_cat_price_idx'),
+            # home page sections read each category in id order
+            models.Index(fields=['category', 'id'], name='product_cat_id_idx'),
+        ]
 
     def __str__(self):
         return str(self.id)
@@ -62,12 +78,18 @@ class Cart(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # one line per product; quantity changes go through app/cart.py
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_cart_user_product'),
+        ]
+
     def __str__(self):
         return str(self.id)
 
 
 # -------------------------------
-# ✅ OrderPlaced Model (Updated)
+# ✅ Order status / payment choices
 # -------------------------------
 STATUS_CHOICES = (
     ('Pending', 'Pending'),
@@ -76,6 +98,7 @@ STATUS_CHOICES = (
     ('On The Way', 'On The Way'),
     ('Delivered', 'Delivered'),
     ('Cancel', 'Cancel'),
+    ('Returned', 'Returned'),
 )
 
 # ✅ Added new PAYMENT_CHOICES here
@@ -87,17 +110,97 @@ PAYMENT_CHOICES = (
     ('SADAPAY', 'SadaPay'),
 )
 
-class OrderPlaced(models.Model):
+def new_tracking_id():
+    return str(uuid.uuid4())
+
+
+# -------------------------------
+# ✅ Order Model (one row per checkout)
+# -------------------------------
+class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    quantity = models.PositiveIntegerField(default=1)
     ordered_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='Pending')
-    # ✅ New field for payment method
     payment_method = models.CharField(max_length=20, choices=PAYMENT_CHOICES, default='COD')
-    # Tracking id for order tracking (UUID string)
-    tracking_id = models.CharField(max_length=36, unique=True, null=True, blank=True)
+    # What was charged, stored so history pages don't re-add lines:
+    # subtotal (sum of the line totals) + shipping (app/pricing.py rule)
+    subtotal = models.FloatField(default=0)
+    shipping = models.FloatField(default=0)
+    total = models.FloatField(default=0)
+    # One tracking id per checkout (UUID string)
+    tracking_id = models.CharField(max_length=36, unique=True, default=new_tracking_id)
+    # When ``status`` was last set: the newest OrderEvent, kept on the row so
+    # reading the current status needs no join (see app/order_events.py)
+    status_changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # order history page: one user's orders, newest first
+            models.Index(fields=['user', '-ordered_date'], name='order_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.id)
+
+
+# -------------------------------
+# ✅ OrderEvent Model (append-only status history)
+# -------------------------------
+EVENT_SOURCES = (
+    ('checkout', 'Checkout'),
+    ('customer', 'Customer'),
+    ('warehouse', 'Warehouse'),
+    ('admin', 'Admin'),
+    ('backfill', 'Backfill'),
+)
+
+
+class OrderEventQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError('Order events are append-only')
+
+    def delete(self):
+        raise TypeError('Order events are append-only; they go away with their order')
+
+
+class OrderEvent(models.Model):
+    # the (order, created_at) index below serves the FK lookups too
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events', db_index=False)
+    status = models.CharField(max_length=50)
+    source = models.CharField(max_length=20, choices=EVENT_SOURCES)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = OrderEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # tracking page timeline: one order's events, oldest first
+            models.Index(fields=['order', 'created_at'], name='orderevent_order_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError('Order events are append-only')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f'{self.order_id} {self.status}'
+
+
+# -------------------------------
+# ✅ OrderLine Model (one row per product in an order)
+# -------------------------------
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    # Unit price at the time of ordering
+    price = models.FloatField()
+
+    @property
+    def line_total(self):
+        return self.quantity * self.price
 
     def __str__(self):
         return str(self.id)
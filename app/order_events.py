@@ -0,0 +1,40 @@
+"""Order status history.
+
+Every status change appends an ``OrderEvent`` and stamps
+``Order.status_changed_at`` in the same transaction, so:
+
+* the current status is ``Order.status`` / ``status_changed_at``, read
+  from the order row without touching the history;
+* the tracking page timeline is one range scan of the
+  ``(order, created_at)`` index.
+
+Events are never updated or deleted (``OrderEventQuerySet`` refuses to);
+they go away with their order. Bulk warehouse updates write theirs in
+``app/order_status.py``.
+"""
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import OrderEvent
+
+
+def record(order, source):
+    """Append the event for ``order``'s current status, dated ``status_changed_at``."""
+    return OrderEvent.objects.create(
+        order=order, status=order.status, source=source, created_at=order.status_changed_at,
+    )
+
+
+def set_status(order, status, source):
+    """Move ``order`` to ``status`` and log it; two queries."""
+    order.status = status
+    order.status_changed_at = timezone.now()
+    with transaction.atomic():
+        order.save(update_fields=['status', 'status_changed_at'])
+        return record(order, source)
+
+
+def timeline_prefetch():
+    """``prefetch_related`` lookup making ``order.events.all`` the timeline, oldest first."""
+    return Prefetch('events', queryset=OrderEvent.objects.order_by('created_at', 'id'))
@@ -0,0 +1,225 @@
+"""Order status state machine and the bulk status pipeline for the warehouse.
+
+Orders move forward through ``STATUS_CHOICES`` one step at a time::
+
+    Pending -> Accepted -> Packed -> On The Way -> Delivered
+
+can be cancelled until they ship and returned once delivered.
+``transition`` moves a single order (the customer's cancel and return). ``apply_status_updates`` takes an
+iterable of ``(tracking_id, status)`` pairs (``read_csv`` / ``read_jsonl``
+parse them from a stream) and, per chunk of ``chunk_size`` rows:
+
+* reads the current status of every tracking id in one query;
+* validates each row against ``TRANSITIONS``, in input order, so a chunk
+  may carry several steps of the same order;
+* writes one ``UPDATE ... WHERE tracking_id IN (...) AND status = <old>``
+  per ``(old, new)`` pair, in one transaction. The status guard means an
+  order changed by someone else in the meantime is reported, not
+  overwritten;
+* appends one ``OrderEvent`` per applied step with a single
+  ``executemany`` (see app/order_events.py).
+
+Used by ``manage.py update_order_status``, the ``order-status-bulk`` API
+and the order admin actions.
+"""
+import csv
+import json
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import order_events
+from .models import STATUS_CHOICES, Order, OrderEvent
+
+CANCELLED = 'Cancel'
+RETURNED = 'Returned'
+# the happy path, in STATUS_CHOICES order
+FLOW = [code for code, _ in STATUS_CHOICES if code not in (CANCELLED, RETURNED)]
+SHIPPED = 'On The Way'
+DELIVERED = 'Delivered'
+
+TRANSITIONS = {code: set() for code, _ in STATUS_CHOICES}
+for current, following in zip(FLOW, FLOW[1:]):
+    TRANSITIONS[current].add(following)
+for status in FLOW[:FLOW.index(SHIPPED)]:
+    TRANSITIONS[status].add(CANCELLED)
+TRANSITIONS[DELIVERED].add(RETURNED)
+
+# rejected rows kept in a report (the counts cover all of them)
+MAX_REJECTED = 100
+# what decode_lines puts in place of bytes that are not UTF-8
+UNDECODABLE = '\ufffd'
+
+
+def can_transition(current, new):
+    return new in TRANSITIONS.get(current, ())
+
+
+def transition(order, status, source):
+    """Move ``order`` to ``status`` and log it, if ``TRANSITIONS`` allows it.
+
+    The ``UPDATE`` is guarded by the status ``order`` was read with, like
+    the bulk pipeline, so a step taken meanwhile by someone else is not
+    overwritten. Returns whether the order moved.
+    """
+    if not can_transition(order.status, status):
+        return False
+    now = timezone.now()
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, status=order.status).update(status=status, status_changed_at=now):
+            return False
+        order.status, order.status_changed_at = status, now
+        order_events.record(order, source)
+    return True
+
+
+@dataclass
+class StatusReport:
+    rows: int = 0
+    applied: int = 0          # rows whose transition was written
+    orders_updated: int = 0
+    unchanged: int = 0        # rows asking for the status the order already has
+    rejected: Counter = field(default_factory=Counter)
+    rejected_rows: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def reject(self, line, tracking_id, status, reason):
+        self.rejected[reason] += 1
+        if len(self.rejected_rows) < MAX_REJECTED:
+            self.rejected_rows.append(
+                {'line': line, 'tracking_id': tracking_id, 'status': status, 'reason': reason}
+            )
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'applied': self.applied,
+            'orders_updated': self.orders_updated,
+            'unchanged': self.unchanged,
+            'rejected': sum(self.rejected.values()),
+            'rejected_by_reason': dict(self.rejected),
+            'rejected_rows': self.rejected_rows,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_s': round(self.rows / self.elapsed) if self.elapsed else None,
+        }
+
+
+def decode_lines(lines):
+    """Text of ``bytes`` lines read as UTF-8, a leading BOM dropped.
+
+    Bytes that are not UTF-8 (a Latin-1/cp1252 export) become U+FFFD, so
+    their row is rejected as unreadable instead of failing the upload.
+    """
+    for number, line in enumerate(lines):
+        yield line.decode('utf-8-sig' if number == 0 else 'utf-8', errors='replace')
+
+
+def read_csv(lines):
+    """``(line, tracking_id, status)`` from CSV text with a header row."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        tracking_id, status = (row.get('tracking_id') or '').strip(), (row.get('status') or '').strip()
+        if UNDECODABLE in tracking_id or UNDECODABLE in status:
+            yield reader.line_num, tracking_id, None
+        else:
+            yield reader.line_num, tracking_id, status
+
+
+def read_jsonl(lines):
+    """``(line, tracking_id, status)`` from one JSON object per line."""
+    for number, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        if UNDECODABLE in text:
+            yield number, '', None
+            continue
+        try:
+            row = json.loads(text)
+            yield number, str(row['tracking_id']).strip(), str(row['status']).strip()
+        except (ValueError, KeyError, TypeError):
+            yield number, '', None
+
+
+def apply_status_updates(rows, chunk_size=500):
+    """Apply ``(line, tracking_id, status)`` rows; returns a ``StatusReport``."""
+    report = StatusReport()
+    start = time.perf_counter()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        report.rows += len(chunk)
+        apply_chunk(chunk, report)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def apply_chunk(chunk, report):
+    with transaction.atomic():
+        ids = {tracking_id for _, tracking_id, _ in chunk if tracking_id}
+        orders = Order.objects.filter(tracking_id__in=ids).values_list('tracking_id', 'id', 'status')
+        order_ids = {}
+        original = {}
+        for tracking_id, order_id, status in orders:
+            order_ids[tracking_id] = order_id
+            original[tracking_id] = status
+        current = dict(original)
+        steps = defaultdict(list)
+        for line, tracking_id, status in chunk:
+            if status is None:
+                report.reject(line, tracking_id, status, 'unreadable row')
+            elif tracking_id not in current:
+                report.reject(line, tracking_id, status, 'unknown tracking id')
+            elif status not in TRANSITIONS:
+                report.reject(line, tracking_id, status, 'unknown status')
+            elif status == current[tracking_id]:
+                report.unchanged += 1
+            elif not can_transition(current[tracking_id], status):
+                report.reject(line, tracking_id, status, f'{current[tracking_id]} -> {status} not allowed')
+            else:
+                current[tracking_id] = status
+                steps[tracking_id].append(status)
+
+        now = timezone.now()
+        at = connection.ops.adapt_datetimefield_value(now)
+        groups = defaultdict(list)
+        for tracking_id, status in current.items():
+            if status != original[tracking_id]:
+                groups[original[tracking_id], status].append(tracking_id)
+        for (old, new), tracking_ids in groups.items():
+            updated = (
+                Order.objects.filter(tracking_id__in=tracking_ids, status=old)
+                .update(status=new, status_changed_at=now)
+            )
+            report.orders_updated += updated
+            report.applied += sum(len(steps[tracking_id]) for tracking_id in tracking_ids)
+            if updated < len(tracking_ids):
+                changed = Order.objects.filter(tracking_id__in=tracking_ids).exclude(status=new)
+                for tracking_id in changed.values_list('tracking_id', flat=True):
+                    report.applied -= len(steps.pop(tracking_id))
+                    report.reject(None, tracking_id, new, 'changed concurrently')
+
+        # one event per applied step; same timestamp, so the id keeps their order
+        events = [
+            (order_ids[tracking_id], status, at)
+            for tracking_id, statuses in steps.items()
+            for status in statuses
+        ]
+        if events:
+            write_events(events)
+
+
+def write_events(events):
+    """Insert ``(order_id, status, created_at)`` warehouse events.
+
+    Plain ``executemany`` rather than ``bulk_create``: building and preparing
+    a model instance per event cost more than the whole status update.
+    """
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {OrderEvent._meta.db_table} (order_id, status, source, created_at) '
+            "VALUES (%s, %s, 'warehouse', %s)",
+            events,
+        )
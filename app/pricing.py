@@ -0,0 +1,118 @@
+"""Cart pricing computed in SQL.
+
+``cart_summary`` returns every line with its ``line_total`` plus the cart
+subtotal in one query (the subtotal is a window ``SUM`` over the same
+rows). ``line_summary`` answers the AJAX endpoint, which only needs one
+line and the totals, with a single aggregate query.
+``anonymous_cart_summary`` prices a cookie cart with one product lookup
+and ``cart_totals`` gives just the item count and subtotal.
+``order_amounts`` applies the same shipping rule to orders placed without
+a cart (buy now).
+"""
+from collections import namedtuple
+
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Sum, Window
+
+from .models import Cart, Product
+
+# simple shipping rule: free over 5000, else fixed 70
+FREE_SHIPPING_OVER = 5000
+SHIPPING_FEE = 70
+
+OrderAmounts = namedtuple('OrderAmounts', ['subtotal', 'shipping', 'total'])
+CartSummary = namedtuple('CartSummary', ['items', 'count', 'amount', 'shipping', 'total'])
+LineSummary = namedtuple('LineSummary', ['quantity', 'line_total', 'amount', 'shipping', 'total'])
+
+
+def line_total_expression():
+    return ExpressionWrapper(
+        F('quantity') * F('product__discounted_price'), output_field=FloatField(),
+    )
+
+
+def shipping_for(amount):
+    return 0 if amount > FREE_SHIPPING_OVER else SHIPPING_FEE
+
+
+def order_amounts(subtotal):
+    """``subtotal``, ``shipping`` and ``total`` of an order whose lines sum to ``subtotal``."""
+    shipping = shipping_for(subtotal)
+    return OrderAmounts(subtotal, shipping, subtotal + shipping)
+
+
+def cart_summary(user):
+    """All cart lines (with ``product`` and ``line_total``) and the totals."""
+    items = list(
+        Cart.objects.filter(user=user)
+        .select_related('product')
+        .annotate(
+            line_total=line_total_expression(),
+            subtotal=Window(Sum(line_total_expression())),
+        )
+        .order_by('id')
+    )
+    amount = items[0].subtotal if items else 0
+    shipping = shipping_for(amount)
+    return CartSummary(
+        items=items,
+        count=sum(item.quantity for item in items),
+        amount=amount,
+        shipping=shipping,
+        total=amount + shipping,
+    )
+
+
+def line_summary(user, cart_id):
+    """Quantity and total of one line plus the cart totals, in one query.
+
+    ``quantity`` and ``line_total`` are 0 when the line no longer exists.
+    """
+    this_line = Q(id=cart_id)
+    totals = Cart.objects.filter(user=user).aggregate(
+        amount=Sum(line_total_expression()),
+        line_total=Sum(line_total_expression(), filter=this_line),
+        quantity=Sum('quantity', filter=this_line),
+    )
+    amount = totals['amount'] or 0
+    shipping = shipping_for(amount)
+    return LineSummary(
+        quantity=totals['quantity'] or 0,
+        line_total=totals['line_total'] or 0,
+        amount=amount,
+        shipping=shipping,
+        total=amount + shipping,
+    )
+
+
+def cart_totals(user_id):
+    """``{'count', 'amount'}`` for a user's cart in one aggregate query."""
+    totals = Cart.objects.filter(user_id=user_id).aggregate(
+        count=Sum('quantity'), amount=Sum(line_total_expression()),
+    )
+    return {'count': totals['count'] or 0, 'amount': totals['amount'] or 0}
+
+
+def anonymous_cart_summary(lines):
+    """Price a cookie cart (``{product_id: quantity}``) like ``cart_summary``.
+
+    Items are unsaved ``Cart`` instances whose ``id`` is the product id, so
+    the cart templates and URLs work unchanged.
+    """
+    products = Product.objects.in_bulk(list(lines))
+    items = []
+    for product_id, quantity in lines.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        item = Cart(id=product_id, product=product, quantity=quantity)
+        item.line_total = quantity * product.discounted_price
+        items.append(item)
+    amount = sum(item.line_total for item in items)
+    shipping = shipping_for(amount)
+    return CartSummary(
+        items=items,
+        count=sum(item.quantity for item in items),
+        amount=amount,
+        shipping=shipping,
+        total=amount + shipping,
+    )
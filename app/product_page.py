@@ -0,0 +1,143 @@
+"""Conditional GET and a rendered-page cache for the product detail page.
+
+The page depends on the product and, through the navbar, on the visitor's
+cart item count, so ``(product version, badge count)`` identifies it:
+
+* the product version is its ``updated_at``, kept in the cache under
+  ``product:version:<pk>`` and dropped by the Product signals (see
+  ``app/signals.py``), so a repeat visit needs no query;
+* the ETag is built from the version and the count, ``If-None-Match`` /
+  ``If-Modified-Since`` are answered with ``304 Not Modified`` before any
+  template is rendered;
+* rendered pages are cached per ``(pk, version, count)``; a save changes
+  the version and with it the key.
+
+Anonymous visitors with an empty cart all see the same page, which gets
+``Last-Modified`` and ``Cache-Control: public``. Everyone else gets a
+private response that must be revalidated. Pages with pending flash
+messages are rendered fresh and never cached.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import cart
+from .models import Product
+from .shortcuts import arender, load_user_state
+
+VERSION_KEY = 'product:version:%s'
+PAGE_KEY = 'product:page:%s:%s:%s'
+
+
+class HitCounter:
+    """How detail requests were served: ``not_modified``, ``cached``, ``rendered``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def add(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def snapshot(self):
+        with self.lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        rendered = counts.get('rendered', 0)
+        return {
+            **counts,
+            'total': total,
+            'without_templates': round((total - rendered) / total, 4) if total else None,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+
+hits = HitCounter()
+
+
+def version_tag(updated_at):
+    return f'{int(updated_at.timestamp() * 1_000_000):x}'
+
+
+async def aproduct_version(pk):
+    """``(updated_at, product)`` for product ``pk``.
+
+    ``product`` is only loaded (and then reused for rendering) when the
+    version is not cached.
+    """
+    updated_at = await cache.aget(VERSION_KEY % pk)
+    if updated_at is not None:
+        return updated_at, None
+    product = await aget_product(pk)
+    await cache.aset(VERSION_KEY % pk, product.updated_at, timeout=settings.PRODUCT_PAGE_CACHE_TIMEOUT)
+    return product.updated_at, product
+
+
+async def aget_product(pk):
+    try:
+        return await Product.objects.aget(pk=pk)
+    except Product.DoesNotExist:
+        raise Http404('No such product')
+
+
+def invalidate(pk):
+    cache.delete(VERSION_KEY % pk)
+
+
+async def abadge_count(request):
+    await load_user_state(request)
+    if request.user.is_authenticated:
+        return request.cart_badge['count']
+    return sum(cart.load_anonymous_cart(request).values())
+
+
+async def product_detail(request, pk):
+    updated_at, product = await aproduct_version(pk)
+    count = await abadge_count(request)
+    if len(messages.get_messages(request)):
+        # flash messages are shown once; this page can't be reused
+        hits.add('rendered')
+        return await render_page(request, pk, product)
+
+    public = not request.user.is_authenticated and count == 0
+    etag = f'"{pk}-{version_tag(updated_at)}-{count}"'
+    last_modified = int(updated_at.timestamp()) if public else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        hits.add('not_modified')
+    else:
+        key = PAGE_KEY % (pk, version_tag(updated_at), count)
+        html = await cache.aget(key)
+        if html is not None:
+            hits.add('cached')
+            response = HttpResponse(html)
+        else:
+            hits.add('rendered')
+            response = await render_page(request, pk, product)
+            await cache.aset(key, response.content, timeout=settings.PRODUCT_PAGE_CACHE_TIMEOUT)
+
+    response['ETag'] = etag
+    if public:
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = f'public, max-age={settings.PRODUCT_PAGE_MAX_AGE}'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    # the navbar count comes from the session or the cart cookie
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+async def render_page(request, pk, product=None):
+    if product is None:
+        product = await aget_product(pk)
+    return await arender(request, 'app/productdetail.html', {'product': product})
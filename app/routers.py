@@ -0,0 +1,93 @@
+"""Primary/replica database routing.
+
+When a ``replica`` database is configured (``DATABASE_REPLICA`` env var,
+see settings), reads of the catalogue and order history go to it and all
+writes go to ``default``. The replica is a copy of the primary that
+``manage.py sync_replica`` refreshes, so it can lag behind.
+
+Read-your-writes: once a request writes to one of this app's tables, the
+rest of that request reads from the primary, and ``ReplicaPinMiddleware``
+sets a short-lived cookie that keeps the visitor's next requests on the
+primary for ``REPLICA_PIN_SECONDS`` until the replica has caught up.
+Reads inside a transaction also stay on the primary.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+REPLICA = 'replica'
+PIN_COOKIE = 'pin_primary'
+# models whose reads may be served slightly stale
+REPLICA_MODELS = {'app.product', 'app.order', 'app.orderline'}
+
+# per request (and per thread): read from the primary / wrote something
+use_primary = ContextVar('use_primary', default=False)
+wrote = ContextVar('wrote', default=False)
+
+
+def replica_enabled():
+    return REPLICA in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not replica_enabled() or model._meta.label_lower not in REPLICA_MODELS:
+            return 'default'
+        if use_primary.get() or wrote.get() or connections['default'].in_atomic_block:
+            return 'default'
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        # sessions are saved on most requests; only real data writes pin
+        if model._meta.app_label == 'app':
+            wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets its schema (and data) from sync_replica
+        return db != REPLICA
+
+
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        primary_token = use_primary.set(PIN_COOKIE in request.COOKIES)
+        wrote_token = wrote.set(False)
+        try:
+            return self.pin(self.get_response(request))
+        finally:
+            use_primary.reset(primary_token)
+            wrote.reset(wrote_token)
+
+    async def __acall__(self, request):
+        # sync_to_async copies context changes back, so ORM writes made on
+        # a worker thread still show up in ``wrote``
+        primary_token = use_primary.set(PIN_COOKIE in request.COOKIES)
+        wrote_token = wrote.set(False)
+        try:
+            return self.pin(await self.get_response(request))
+        finally:
+            use_primary.reset(primary_token)
+            wrote.reset(wrote_token)
+
+    def pin(self, response):
+        if wrote.get() and replica_enabled():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,107 @@
+"""Product full-text search.
+
+On SQLite the catalogue is mirrored into an FTS5 virtual table
+(``app_product_fts``, created by migration 0008) whose rowid is the
+product id. Queries are ranked with bm25 and every term is matched as a
+prefix, so "sams gal" finds "Samsung Galaxy". Other database backends fall
+back to ``icontains`` lookups.
+
+The index is kept in sync by the Product signals in ``app/signals.py``;
+``manage.py rebuild_search_index`` rebuilds it after bulk loads.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+
+FTS_TABLE = 'app_product_fts'
+
+# bm25 column weights for (title, brand, description)
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every word is a quoted prefix term."""
+    terms = TERM_RE.findall(query)
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+def search_products(query, page=1, per_page=24):
+    """Return ``(products, has_next)`` for page ``page`` of ``query``."""
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+    if fts_enabled():
+        expression = match_expression(query)
+        if not expression:
+            return [], False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s OFFSET %s',
+                [expression, *COLUMN_WEIGHTS, per_page + 1, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        has_next = len(ids) > per_page
+        ids = ids[:per_page]
+        by_id = Product.objects.in_bulk(ids)
+        return [by_id[pk] for pk in ids if pk in by_id], has_next
+
+    products = list(
+        Product.objects.filter(
+            Q(title__icontains=query) |
+            Q(brand__icontains=query) |
+            Q(description__icontains=query)
+        ).order_by('id')[offset:offset + per_page + 1]
+    )
+    return products[:per_page], len(products) > per_page
+
+
+async def asearch_products(query, page=1, per_page=24):
+    """``search_products`` for async views.
+
+    The FTS5 lookup is raw SQL, which has no async API, so the whole search
+    runs on a worker thread.
+    """
+    return await sync_to_async(search_products)(query, page, per_page)
+
+
+def index_product(product):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, brand, description) VALUES (%s, %s, %s, %s)',
+            [product.pk, product.title, product.brand, product.description],
+        )
+
+
+def unindex_product(pk):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild_index():
+    """Re-populate the FTS table from ``app_product``; returns rows indexed."""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, brand, description) '
+            f'SELECT id, title, brand, description FROM app_product'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
@@ -0,0 +1,23 @@
+"""Helpers for async views."""
+from django.shortcuts import render
+
+from . import cart
+
+
+async def load_user_state(request):
+    """Resolve ``request.user`` and the navbar cart badge.
+
+    The auth, messages and cart badge context processors read the user, the
+    session and the badge cache, which would otherwise load lazily from the
+    database in the middle of rendering.
+    """
+    # auser() also loads the session the messages storage reads
+    request.user = await request.auser()
+    if request.user.is_authenticated:
+        request.cart_badge = await cart.acart_badge(request.user)
+
+
+async def arender(request, template_name, context=None, status=None):
+    """``render()`` for async views; the template renders on the event loop."""
+    await load_user_state(request)
+    return render(request, template_name, context, status=status)
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cart, db, home_cache, images, product_page, search, suggest
+from .models import Cart, Product
+
+# SQLite pragmas of the active DATABASE_PROFILE on every new connection
+connection_created.connect(db.configure_connection, dispatch_uid='app.db.configure_connection')
+
+
+# registered first so the cache invalidation below sees the new thumbnails
+@receiver(post_save, sender=Product)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    # new or replaced image: build its thumbnails (bulk loads use the backfill command)
+    if settings.IMAGE_DERIVATIVES_ON_SAVE and not raw and images.needs_derivatives(instance):
+        images.generate_for_product(instance)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    # catalogue changed: drop the cached home page sliders and the product's page
+    home_cache.invalidate()
+    product_page.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    search.index_product(instance)
+    # the in-process index must not see a save that is rolled back
+    transaction.on_commit(lambda: suggest.index.update(instance))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    search.unindex_product(instance.pk)
+    pk = instance.pk  # cleared by delete() before the commit
+    transaction.on_commit(lambda: suggest.index.remove(pk))
+
+
+@receiver(post_save, sender=Product)
+def product_repriced(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # the cart badge totals discounted_price; drop it for the carts holding it
+    if created or raw or (update_fields is not None and 'discounted_price' not in update_fields):
+        return
+    cart.product_repriced(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Cart)
+def cart_line_changed(sender, instance, raw=False, **kwargs):
+    # admin edits and cascades from a deleted product or user; app/cart.py
+    # calls cart_changed itself for its queryset updates
+    if not raw:
+        cart.cart_changed(instance.user_id)
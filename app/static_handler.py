@@ -0,0 +1,193 @@
+"""WSGI and ASGI middleware that serves the collected static files directly.
+
+Wrapping the Django application in ``StaticAssetsHandler`` (see
+``onlineshopping/wsgi.py``), or ``AsyncStaticAssetsHandler`` for ASGI
+(``onlineshopping/asgi.py``), lets a plain application server serve
+``/static/`` without a front proxy:
+
+* the ``staticfiles.json`` manifest is read once, when the handler is
+  created, and every served file is stat-ed up front;
+* hashed names get ``Cache-Control: immutable`` with a far-future
+  ``max-age``, original names must be revalidated;
+* the ``.br``/``.gz`` sibling written by ``collectstatic`` is sent when the
+  client accepts it (by name or ``*``), with ``Vary: Accept-Encoding``;
+* ``If-None-Match`` (weak comparison) is answered with ``304 Not Modified``.
+
+Requests for anything else go to the wrapped application unchanged.
+"""
+import mimetypes
+import os
+from collections import namedtuple
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+# served encodings, most preferred first, and their file suffix
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+BLOCK_SIZE = 64 * 1024
+
+Variant = namedtuple('Variant', ['path', 'size', 'etag'])
+Asset = namedtuple('Asset', ['content_type', 'cache_control', 'variants'])
+
+
+def file_variant(path, encoding=None):
+    stat = os.stat(path)
+    tag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+    if encoding:
+        tag += f'-{encoding}'
+    return Variant(path, stat.st_size, f'"{tag}"')
+
+
+def load_assets(storage):
+    """Map every collected file name (hashed and original) to an ``Asset``."""
+    assets = {}
+    # ManifestStaticFilesStorage reads staticfiles.json when it is created
+    hashed_files = getattr(storage, 'hashed_files', {})
+    immutable = f'public, max-age={settings.STATIC_CACHE_MAX_AGE}, immutable'
+    for original, hashed in hashed_files.items():
+        for name, cache_control in ((hashed, immutable), (original, 'public, max-age=0, must-revalidate')):
+            path = storage.path(name)
+            if not os.path.isfile(path):
+                continue
+            variants = {None: file_variant(path)}
+            for encoding, suffix in ENCODINGS:
+                if os.path.isfile(path + suffix):
+                    variants[encoding] = file_variant(path + suffix, encoding)
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type.endswith('javascript'):
+                content_type += '; charset=utf-8'
+            assets[name] = Asset(content_type, cache_control, variants)
+    return assets
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an ``Accept-Encoding`` header.
+
+    A missing or unreadable ``q`` counts as 1 and 0 respectively, so
+    ``gzip;q=abc`` is not taken as acceptable.
+    """
+    qualities = {}
+    for part in header.split(','):
+        coding, *params = part.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    return qualities
+
+
+def accepts(qualities, encoding):
+    """Whether ``encoding`` is acceptable; ``*`` covers codings not listed."""
+    return qualities.get(encoding, qualities.get('*', 0)) > 0
+
+
+def etag_matches(etag, if_none_match):
+    """``If-None-Match`` weak comparison: ``W/"x"`` matches ``"x"``, ``*`` anything."""
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def respond(asset, method, accept_encoding, if_none_match):
+    """``(status, headers, file path or None)`` for a request for ``asset``."""
+    accepted = accepted_encodings(accept_encoding)
+    encoding = next(
+        (enc for enc, _ in ENCODINGS if enc in asset.variants and accepts(accepted, enc)), None,
+    )
+    variant = asset.variants[encoding]
+    headers = [
+        ('Cache-Control', asset.cache_control),
+        ('ETag', variant.etag),
+    ]
+    if len(asset.variants) > 1:
+        headers.append(('Vary', 'Accept-Encoding'))
+
+    if etag_matches(variant.etag, if_none_match):
+        return HTTPStatus.NOT_MODIFIED, headers, None
+
+    headers += [('Content-Type', asset.content_type), ('Content-Length', str(variant.size))]
+    if encoding:
+        headers.append(('Content-Encoding', encoding))
+    return HTTPStatus.OK, headers, None if method == 'HEAD' else variant.path
+
+
+class StaticAssetsHandler:
+    def __init__(self, application, storage=None):
+        self.application = application
+        self.prefix = settings.STATIC_URL
+        self.assets = load_assets(storage or staticfiles_storage)
+
+    def find(self, path, method):
+        if path.startswith(self.prefix) and method in ('GET', 'HEAD'):
+            return self.assets.get(path[len(self.prefix):])
+        return None
+
+    def __call__(self, environ, start_response):
+        asset = self.find(environ.get('PATH_INFO', ''), environ.get('REQUEST_METHOD'))
+        if asset is None:
+            return self.application(environ, start_response)
+        return self.serve(asset, environ, start_response)
+
+    def serve(self, asset, environ, start_response):
+        status, headers, path = respond(
+            asset, environ['REQUEST_METHOD'],
+            environ.get('HTTP_ACCEPT_ENCODING', ''), environ.get('HTTP_IF_NONE_MATCH', ''),
+        )
+        start_response(f'{status.value} {status.phrase}', headers)
+        if path is None:
+            return []
+        fh = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper:
+            return file_wrapper(fh, BLOCK_SIZE)
+        return read_blocks(fh)
+
+
+class AsyncStaticAssetsHandler(StaticAssetsHandler):
+    """The ASGI version; file reads run on a worker thread."""
+
+    async def __call__(self, scope, receive, send):
+        asset = None
+        if scope['type'] == 'http':
+            asset = self.find(scope['path'], scope['method'])
+        if asset is None:
+            return await self.application(scope, receive, send)
+
+        request_headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        status, headers, path = respond(
+            asset, scope['method'],
+            request_headers.get('accept-encoding', ''), request_headers.get('if-none-match', ''),
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': status.value,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        if path is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        fh = await sync_to_async(open, thread_sensitive=False)(path, 'rb')
+        try:
+            while block := await sync_to_async(fh.read, thread_sensitive=False)(BLOCK_SIZE):
+                await send({'type': 'http.response.body', 'body': block, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            fh.close()
+
+
+def read_blocks(fh):
+    with fh:
+        while block := fh.read(BLOCK_SIZE):
+            yield block
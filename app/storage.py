@@ -0,0 +1,79 @@
+"""Static files storage: content-hashed names plus gzip/brotli siblings.
+
+``collectstatic`` copies every asset to ``STATIC_ROOT`` under a name that
+contains its content hash (``style.1a2b3c4d5e6f.css``), records the
+mapping in ``staticfiles.json`` and, for text assets, writes ``.gz`` and
+(when the ``brotli`` package is installed) ``.br`` siblings that
+``app.static_handler`` serves to clients that accept them.
+"""
+import gzip
+import logging
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# files worth compressing; images and fonts are compressed already
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.ttf', '.eot')
+# sibling suffix -> compress(bytes)
+ENCODERS = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+if brotli is not None:
+    ENCODERS['.br'] = lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # tolerate templates referencing files that are not in the manifest
+    manifest_strict = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.missing_references = set()
+
+    def stored_name(self, name):
+        # before the first collectstatic there is no manifest: use plain names
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            # all.min.css refers to webfonts this project does not ship;
+            # leave such urls as they are instead of failing collectstatic
+            try:
+                return converter(matchobj)
+            except ValueError:
+                target = matchobj['url'].split('?')[0].split('#')[0]
+                if (name, target) not in self.missing_references:
+                    self.missing_references.add((name, target))
+                    logger.warning('%s refers to missing file %s; url left unhashed', name, target)
+                return matchobj.group(0)
+
+        return convert
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as fh:
+            data = fh.read()
+        for suffix, encode in ENCODERS.items():
+            encoded = encode(data)
+            target = name + suffix
+            if self.exists(target):
+                self.delete(target)
+            # only keep variants that are actually smaller
+            if len(encoded) < len(data):
+                self._save(target, ContentFile(encoded))
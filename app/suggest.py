@@ -0,0 +1,174 @@
+"""In-process trigram index behind the search-as-you-type API.
+
+Every product gets one slot holding its title and brand. Trigram postings
+are ``array('I')`` lists of slot numbers, so memory stays close to 4 bytes
+per (trigram, product) pair. The index is
+built lazily on the first lookup and updated in place once a product save
+or delete commits (see ``app/signals.py``).
+
+Each process has its own index and needs no shared cache to follow the
+others: every ``SUGGEST_SYNC_SECONDS`` a lookup reads the products saved
+since the newest ``updated_at`` it has seen and patches them in, and every
+``SUGGEST_REBUILD_SECONDS`` it rebuilds from scratch, which also drops
+products deleted by another process.
+"""
+import heapq
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+
+from .models import Product
+
+# saves are read again for this long after a newer one was seen, in case
+# their transaction committed after it
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigrams_for_query(query):
+    # only grams a word *starting* with the query must contain
+    padded = f' {query}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.ready = False
+        self.synced_to = None          # newest Product.updated_at applied
+        self.built_at = 0.0            # time.monotonic() of the last build
+        self.synced_at = 0.0           # ... and of the last build or sync
+        self.product_ids = array('I')  # slot -> product id (0 = removed)
+        self.titles = []               # slot -> title as displayed
+        self.names = []                # slot -> lower-cased "title brand"
+        self.postings = {}             # trigram -> array('I') of slots
+        self.slot_by_product = {}      # product id -> slot
+        self.removed = 0
+
+    def build(self):
+        with self.lock:
+            if self.ready and time.monotonic() - self.built_at <= settings.SUGGEST_REBUILD_SECONDS:
+                return  # another thread just did it
+            self._clear()
+            rows = Product.objects.values_list('id', 'title', 'brand', 'updated_at').order_by('id')
+            for pk, title, brand, updated_at in rows.iterator(chunk_size=2000):
+                self._add(pk, title, brand)
+                self._seen(updated_at)
+            self.built_at = self.synced_at = time.monotonic()
+            self.ready = True
+
+    def sync(self):
+        """Patch in the products saved since the last build or sync, in any process."""
+        with self.lock:
+            if not self.ready or time.monotonic() - self.synced_at <= settings.SUGGEST_SYNC_SECONDS:
+                return
+            rows = Product.objects.values_list('id', 'title', 'brand', 'updated_at')
+            if self.synced_to is not None:
+                rows = rows.filter(updated_at__gte=self.synced_to - SYNC_OVERLAP)
+            for pk, title, brand, updated_at in rows:
+                self._put(pk, title, brand)
+                self._seen(updated_at)
+            self.synced_at = time.monotonic()
+
+    def _seen(self, updated_at):
+        if self.synced_to is None or updated_at > self.synced_to:
+            self.synced_to = updated_at
+
+    def _add(self, pk, title, brand):
+        slot = len(self.names)
+        name = f'{title} {brand}'.lower()
+        self.product_ids.append(pk)
+        self.titles.append(title)
+        self.names.append(name)
+        for gram in trigrams(name):
+            self.postings.setdefault(gram, array('I')).append(slot)
+        self.slot_by_product[pk] = slot
+
+    def _put(self, pk, title, brand):
+        # leave an unchanged product in its slot; syncs read recent saves again
+        slot = self.slot_by_product.get(pk)
+        if slot is not None and self.titles[slot] == title and self.names[slot] == f'{title} {brand}'.lower():
+            return
+        self._remove(pk)
+        if self.ready:
+            self._add(pk, title, brand)
+
+    def _remove(self, pk):
+        # slots are tombstoned rather than compacted; postings skip them
+        slot = self.slot_by_product.pop(pk, None)
+        if slot is None:
+            return
+        self.product_ids[slot] = 0
+        self.removed += 1
+        # once most slots are dead, drop everything and rebuild on next lookup
+        if self.removed > 1000 and self.removed * 2 > len(self.names):
+            self._clear()
+
+    def update(self, product):
+        """Apply a committed save of ``product``."""
+        with self.lock:
+            if self.ready:
+                self._put(product.pk, product.title, product.brand)
+                self._seen(product.updated_at)
+
+    def remove(self, pk):
+        with self.lock:
+            self._remove(pk)
+
+    def suggest(self, query, limit=10):
+        """Top ``limit`` matches as ``[{'id', 'title'}]``, best first.
+
+        A product matches when a word of its title or brand starts with the
+        query. Candidates come from intersecting the postings of the query's
+        trigrams, rarest first; titles that start with the query rank first,
+        then shorter titles.
+        """
+        query = ' '.join(query.lower().split())
+        if len(query) < 2:
+            return []
+        now = time.monotonic()
+        if not self.ready or now - self.built_at > settings.SUGGEST_REBUILD_SECONDS:
+            self.build()
+        elif now - self.synced_at > settings.SUGGEST_SYNC_SECONDS:
+            self.sync()
+        # local references stay consistent even if a rebuild swaps them out
+        postings, product_ids = self.postings, self.product_ids
+        names, titles = self.names, self.titles
+
+        lists = sorted(
+            (postings.get(gram, ()) for gram in trigrams_for_query(query)), key=len,
+        )
+        candidates = set(lists[0])
+        for slots in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(slots)
+
+        needle = ' ' + query
+        ranked = (
+            (not names[slot].startswith(query), len(titles[slot]), slot)
+            for slot in candidates
+            if product_ids[slot] and needle in ' ' + names[slot]
+        )
+        return [
+            {'id': product_ids[slot], 'title': titles[slot]}
+            for _, _, slot in heapq.nsmallest(limit, ranked)
+        ]
+
+    def reset(self):
+        """Drop this index; the next lookup rebuilds it (after bulk loads)."""
+        with self.lock:
+            self._clear()
+
+
+index = SuggestIndex()
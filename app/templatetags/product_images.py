@@ -0,0 +1,44 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+# preferred source formats, best compression first
+PICTURE_FORMATS = [('avif', 'image/avif'), ('webp', 'image/webp')]
+
+
+def srcset(variants):
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w'
+        for width, name in sorted(variants.items(), key=lambda item: int(item[0]))
+    )
+
+
+@register.simple_tag
+def product_picture(product, sizes='200px', **attrs):
+    """``<picture>`` for a product image with responsive ``srcset`` sources.
+
+    Falls back to a plain ``<img>`` of the original upload until the
+    derivatives have been built. Extra keyword arguments become ``<img>``
+    attributes, e.g. ``{% product_picture p sizes='200px' height='200px' %}``.
+    """
+    variants = (product.image_variants or {}).get('variants', {})
+    img_attrs = format_html_join(' ', '{}="{}"', sorted(attrs.items()))
+    if not variants:
+        return format_html('<img src="{}" {}>', product.product_image.url, img_attrs)
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset(variants[fmt]), sizes) for fmt, mime in PICTURE_FORMATS if fmt in variants),
+    )
+    # the original-format copies are the <img> fallback for old browsers
+    fallback = next(
+        (v for fmt, v in variants.items() if fmt not in dict(PICTURE_FORMATS)),
+        variants.get('webp'),
+    )
+    smallest = min(fallback.items(), key=lambda item: int(item[0]))[1]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" {}></picture>',
+        sources, default_storage.url(smallest), srcset(fallback), sizes, img_attrs,
+    )
@@ -1,3 +1,1461 @@
-from django.test import TestCase
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import cart, exports, order_events, order_status, product_page, routers, search, suggest, urls
+from .db import current_pragmas
+from .middleware import QueryBudgetExceeded, RequestMetricsMiddleware, metrics
+from .static_handler import AsyncStaticAssetsHandler, StaticAssetsHandler
+from .pricing import cart_summary, cart_totals, line_summary
+from .checkout import place_order
+from .admin import OrderModelAdmin
+from .models import Cart, Customer, Order, OrderEvent, OrderLine, Product
+
+
+def make_products(count, category='M', **extra):
+    fields = {
+        'selling_price': 1000,
+        'description': 'A product',
+        'brand': 'Brand',
+        'product_image': 'productimg/test.jpg',
+        **extra,
+    }
+    return Product.objects.bulk_create([
+        Product(title=f'Product {i}', discounted_price=900 + i, category=category, **fields)
+        for i in range(count)
+    ])
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='pass12345')
+        self.customer = Customer.objects.create(
+            user=self.user, name='Buyer', locality='Street 1', city='Lahore',
+            zipcode=54000, state='Punjab',
+        )
+
+    def fill_cart(self, lines):
+        products = make_products(lines)
+        Cart.objects.bulk_create([
+            Cart(user=self.user, product=p, quantity=2) for p in products
+        ])
+
+    def test_place_order_moves_cart_into_one_order(self):
+        self.fill_cart(3)
+        result = place_order(self.user, self.customer, 'COD')
+
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(result.order, order)
+        self.assertEqual(order.lines.count(), 3)
+        self.assertEqual(order.total, 2 * (900 + 901 + 902))
+        self.assertEqual((order.subtotal, order.shipping), (order.total, 0))  # free over 5000
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_buy_now_charges_shipping_like_checkout(self):
+        product = make_products(1)[0]
+        self.client.force_login(self.user)
+        self.client.post(reverse('buy-now') + f'?product_id={product.id}', {
+            'custid': self.customer.id, 'quantity': 2,
+        })
+        order = Order.objects.get(user=self.user)
+        self.assertEqual((order.subtotal, order.shipping, order.total), (1800, 70, 1870))
+        self.assertEqual(order.total, sum(line.line_total for line in order.lines.all()) + order.shipping)
+
+    def test_empty_cart_places_nothing(self):
+        result = place_order(self.user, self.customer, 'COD')
+        self.assertIsNone(result.order)
+        self.assertFalse(Order.objects.exists())
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self.fill_cart(2)
+        small = place_order(self.user, self.customer, 'COD').queries
+        self.fill_cart(50)
+        large = place_order(self.user, self.customer, 'COD').queries
+        self.assertEqual(small, large)
+
+    def test_payment_done_view(self):
+        self.fill_cart(2)
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('payment-done'), {
+            'custid': self.customer.id, 'payment_method': 'COD',
+        })
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(user=self.user)
+        self.assertContains(response, order.tracking_id)
+        self.assertEqual(order.lines.count(), 2)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+
+class OrderViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='pass12345')
+        self.customer = Customer.objects.create(
+            user=self.user, name='Buyer', locality='Street 1', city='Lahore',
+            zipcode=54000, state='Punjab',
+        )
+        self.order = Order.objects.create(
+            user=self.user, customer=self.customer, status='Accepted', total=1800,
+        )
+        OrderLine.objects.bulk_create([
+            OrderLine(order=self.order, product=p, quantity=1, price=p.discounted_price)
+            for p in make_products(2)
+        ])
+        self.client.force_login(self.user)
+
+    def test_track_order_shows_all_lines(self):
+        response = self.client.get(reverse('track-order'), {'tracking_id': self.order.tracking_id})
+        self.assertContains(response, 'Product 0')
+        self.assertContains(response, 'Product 1')
+
+    def test_orders_page_lists_headers(self):
+        response = self.client.get(reverse('orders'))
+        self.assertEqual(list(response.context['orders']), [self.order])
+
+    def test_cancel_and_return_follow_the_state_machine(self):
+        # an accepted order can't be returned, only cancelled
+        self.client.post(reverse('return-order', args=[self.order.id]))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'Accepted')
+
+        self.client.post(reverse('cancel-order', args=[self.order.id]))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'Cancel')
+        self.assertEqual(list(self.order.events.values_list('status', 'source')), [('Cancel', 'customer')])
+
+        response = self.client.post(reverse('cancel-order', args=[self.order.id]), follow=True)
+        self.assertContains(response, 'can no longer be cancelled')
+        self.assertEqual(self.order.events.count(), 1)
+
+    def test_only_delivered_orders_can_be_returned(self):
+        Order.objects.filter(id=self.order.id).update(status='Delivered')
+        response = self.client.get(reverse('track-order'), {'tracking_id': self.order.tracking_id})
+        self.assertEqual((response.context['can_cancel'], response.context['can_return']), (False, True))
+
+        self.client.post(reverse('cancel-order', args=[self.order.id]))
+        self.client.post(reverse('return-order', args=[self.order.id]))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'Returned')
+
+
+class HomePageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_products(2, category='M')
+        make_products(1, category='S')
+
+    def test_second_hit_is_served_from_cache(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Product 1')
+
+    def test_product_save_invalidates_sections(self):
+        self.client.get(reverse('home'))
+        product = Product.objects.get(category='S')
+        product.title = 'Renamed shoe'
+        product.save()
+        self.assertContains(self.client.get(reverse('home')), 'Renamed shoe')
+
+        product.delete()
+        self.assertNotContains(self.client.get(reverse('home')), 'Renamed shoe')
+
+
+@override_settings(CATEGORY_PAGE_SIZE=4)
+class CategoryListingTests(TestCase):
+    def setUp(self):
+        make_products(10, category='L', brand='HP')
+        make_products(3, category='L', brand='DELL')
+
+    def test_keyset_pages_cover_every_product_once(self):
+        seen = []
+        after = None
+        while True:
+            params = {'after': after} if after else {}
+            response = self.client.get(reverse('laptop'), params)
+            seen.extend(p.id for p in response.context['laptops'])
+            after = response.context['next_cursor']
+            if not after:
+                break
+        self.assertEqual(sorted(seen), sorted(Product.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_brand_and_price_band_filters(self):
+        response = self.client.get(reverse('laptopdata', args=['DELL']))
+        self.assertEqual({p.brand for p in response.context['laptops']}, {'DELL'})
+
+        response = self.client.get(reverse('mobiledata', args=['below']))
+        self.assertEqual(list(response.context['mobiles']), [])
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        response = self.client.get(reverse('laptop'), {'after': 'garbage'})
+        self.assertEqual(len(response.context['laptops']), 4)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        Product.objects.create(
+            title='Samsung Galaxy A15', selling_price=50000, discounted_price=45000,
+            description='Android phone', brand='SAMSUNG', category='M',
+            product_image='productimg/test.jpg',
+        )
+        Product.objects.create(
+            title='Phone case', selling_price=900, discounted_price=800,
+            description='Fits the Samsung Galaxy', brand='Generic', category='M',
+            product_image='productimg/test.jpg',
+        )
+
+    def test_prefix_terms_rank_title_matches_first(self):
+        response = self.client.get(reverse('search'), {'q': 'sams gal'})
+        titles = [p.title for p in response.context['results']]
+        self.assertEqual(titles, ['Samsung Galaxy A15', 'Phone case'])
+
+    def test_index_follows_product_changes(self):
+        product = Product.objects.get(title='Phone case')
+        product.title = 'Leather wallet'
+        product.description = 'Brown'
+        product.save()
+        response = self.client.get(reverse('search'), {'q': 'wallet'})
+        self.assertEqual(list(response.context['results']), [product])
+
+        product.delete()
+        response = self.client.get(reverse('search'), {'q': 'wallet'})
+        self.assertEqual(list(response.context['results']), [])
+
+    @override_settings(SEARCH_PAGE_SIZE=1)
+    def test_pagination(self):
+        response = self.client.get(reverse('search'), {'q': 'samsung'})
+        self.assertTrue(response.context['has_next'])
+        response = self.client.get(reverse('search'), {'q': 'samsung', 'page': 2})
+        self.assertEqual(len(response.context['results']), 1)
+        self.assertFalse(response.context['has_next'])
+
+    def test_punctuation_only_query_returns_nothing(self):
+        response = self.client.get(reverse('search'), {'q': '"*'})
+        self.assertEqual(list(response.context['results']), [])
+
+    def test_huge_page_is_clamped(self):
+        response = self.client.get(reverse('search'), {'q': 'sam', 'page': '9' * 23})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page'], settings.SEARCH_MAX_PAGE)
+        self.assertEqual(list(response.context['results']), [])
+        response = self.client.get(reverse('search'), {'q': 'sam', 'page': '-5'})
+        self.assertEqual(response.context['page'], 1)
+
+
+class SearchSuggestTests(TestCase):
+    def setUp(self):
+        suggest.index.reset()
+        self.phone = Product.objects.create(
+            title='Galaxy A15', selling_price=50000, discounted_price=45000,
+            description='Android phone', brand='SAMSUNG', category='M',
+            product_image='productimg/test.jpg',
+        )
+        make_products(5, category='L', brand='HP')
+
+    def suggest(self, q):
+        return self.client.get(reverse('search-suggest'), {'q': q}).json()
+
+    def test_prefix_of_title_or_brand(self):
+        for q in ('gala', 'sams'):
+            data = self.suggest(q)
+            self.assertEqual(data['results'][0]['id'], self.phone.id)
+            self.assertEqual(
+                data['results'][0]['url'], reverse('product-detail', args=[self.phone.id])
+            )
+
+    def test_index_refreshes_on_save_and_delete(self):
+        self.suggest('gala')  # build the index
+        self.phone.title = 'Note 13'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.save()
+        self.assertEqual(self.suggest('note')['results'][0]['id'], self.phone.id)
+        self.assertNotIn(self.phone.id, [r['id'] for r in self.suggest('gala')['results']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.delete()
+        self.assertEqual(self.suggest('note')['results'], [])
+
+    def test_rolled_back_save_leaves_index_alone(self):
+        self.suggest('gala')
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.phone.title = 'Note 13'
+                    self.phone.save()
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+        self.assertEqual(self.suggest('note')['results'], [])
+        self.assertEqual(self.suggest('gala')['results'][0]['id'], self.phone.id)
+
+    def test_other_processes_sync_saves_and_rebuild_for_deletes(self):
+        other = suggest.SuggestIndex()  # stands in for another worker
+        self.assertEqual(other.suggest('gala')[0]['id'], self.phone.id)
+        # saved here without running this process's commit hook
+        self.phone.title = 'Note 13'
+        self.phone.save()
+        self.assertEqual(other.suggest('gala')[0]['id'], self.phone.id)  # until its next sync
+
+        with self.settings(SUGGEST_SYNC_SECONDS=0), self.assertNumQueries(1):
+            # one query for the recent saves, no rebuild
+            self.assertEqual(other.suggest('note')[0]['id'], self.phone.id)
+        self.assertEqual(other.suggest('gala'), [])
+
+        Product.objects.filter(pk=self.phone.pk).delete()
+        with self.settings(SUGGEST_REBUILD_SECONDS=0):
+            self.assertEqual(other.suggest('note'), [])
+
+    def test_limit_is_clamped(self):
+        for limit, count in ((0, 1), (-3, 1), (99, 5)):
+            response = self.client.get(reverse('search-suggest'), {'q': 'pro', 'limit': limit})
+            self.assertEqual(len(response.json()['results']), count)
+
+    def test_empty_query(self):
+        self.assertEqual(self.suggest('  ')['results'], [])
+
+
+def hammer(func, threads=8, iterations=25):
+    """Run ``func`` ``iterations`` times in each of ``threads`` threads at once.
+
+    SQLite may report a locked table when two writers collide; such calls
+    are retried, like a busy timeout would. Any other exception is re-raised.
+    """
+    errors = []
+    start = threading.Barrier(threads)
+
+    def worker():
+        try:
+            start.wait()
+            for _ in range(iterations):
+                while True:
+                    try:
+                        func()
+                        break
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+        except Exception as exc:  # surfaced in the main thread below
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    if errors:
+        raise errors[0]
+
+
+class CartConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        # a badge refresh that hits a locked table after the commit is logged
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.user = User.objects.create_user('clicker', password='pass12345')
+        self.product = make_products(1)[0]
+
+    def test_concurrent_adds_lose_no_updates(self):
+        hammer(lambda: cart.add_product(self.user, self.product), threads=8, iterations=25)
+        line = Cart.objects.get(user=self.user, product=self.product)
+        self.assertEqual(line.quantity, 8 * 25)
+
+    def test_concurrent_login_merges_add_up(self):
+        Cart.objects.create(user=self.user, product=self.product, quantity=2)
+        other = make_products(1, brand='Other')[0]
+        hammer(lambda: cart.merge_anonymous_cart(self.user, {self.product.pk: 1, other.pk: 3}),
+               threads=8, iterations=10)
+        quantities = dict(Cart.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.product.pk: 2 + 80, other.pk: 3 * 80})
+
+    def test_concurrent_increments_and_decrements_balance(self):
+        line = Cart.objects.create(user=self.user, product=self.product, quantity=500)
+        hammer(lambda: cart.increment(self.user, line.id), threads=4, iterations=25)
+        hammer(lambda: cart.decrement(self.user, line.id), threads=4, iterations=25)
+        line.refresh_from_db()
+        self.assertEqual(line.quantity, 500)
+
+
+class CartServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clicker', password='pass12345')
+        self.product = make_products(1)[0]
+
+    def test_decrement_removes_last_unit(self):
+        line = Cart.objects.create(user=self.user, product=self.product, quantity=1)
+        self.assertTrue(cart.decrement(self.user, line.id))
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(cart.decrement(self.user, line.id))
+
+    def test_other_users_lines_are_untouched(self):
+        other = User.objects.create_user('other', password='pass12345')
+        line = Cart.objects.create(user=other, product=self.product, quantity=3)
+        self.assertFalse(cart.increment(self.user, line.id))
+        self.assertFalse(cart.remove(self.user, line.id))
+        line.refresh_from_db()
+        self.assertEqual(line.quantity, 3)
+
+    def test_update_view_404s_for_missing_line(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('update-cart-quantity', args=[999, 'inc']))
+        self.assertEqual(response.status_code, 404)
+
+
+class CartPricingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.products = make_products(3)  # 900, 901, 902
+        self.lines = Cart.objects.bulk_create([
+            Cart(user=self.user, product=p, quantity=i + 1) for i, p in enumerate(self.products)
+        ])
+
+    def test_cart_summary_in_one_query(self):
+        with self.assertNumQueries(1):
+            summary = cart_summary(self.user)
+        self.assertEqual([item.line_total for item in summary.items], [900, 1802, 2706])
+        self.assertEqual(summary.amount, 5408)
+        self.assertEqual(summary.shipping, 0)
+        self.assertEqual(summary.total, 5408)
+        self.assertEqual(summary.count, 6)
+
+    def test_shipping_applies_below_threshold(self):
+        Cart.objects.exclude(id=self.lines[0].id).delete()
+        summary = cart_summary(self.user)
+        self.assertEqual((summary.amount, summary.shipping, summary.total), (900, 70, 970))
+
+    def test_empty_cart(self):
+        Cart.objects.all().delete()
+        summary = cart_summary(self.user)
+        self.assertEqual((summary.items, summary.amount, summary.total), ([], 0, 70))
+
+    def test_line_summary_in_one_query(self):
+        with self.assertNumQueries(1):
+            summary = line_summary(self.user, self.lines[1].id)
+        self.assertEqual((summary.quantity, summary.line_total, summary.amount), (2, 1802, 5408))
+
+        summary = line_summary(self.user, 999)
+        self.assertEqual((summary.quantity, summary.line_total), (0, 0))
+
+    def test_cart_update_api(self):
+        self.client.force_login(self.user)
+        data = self.client.post(reverse('cart-update-api'), {
+            'cart_id': self.lines[0].id, 'action': 'dec',
+        }).json()
+        self.assertEqual(data['quantity'], 0)
+        self.assertEqual(data['amount'], 4508)
+        self.assertEqual(data['shipping'], 70)
+        self.assertEqual(data['total'], 4578)
+
+
+class AnonymousCartTests(TestCase):
+    def setUp(self):
+        self.products = make_products(2)
+        self.user = User.objects.create_user('shopper', password='pass12345')
+
+    def add(self, product):
+        return self.client.get(reverse('add-to-cart'), {'product_id': product.id})
+
+    def test_adding_without_login_writes_nothing(self):
+        with self.assertNumQueries(1):  # the product lookup
+            response = self.add(self.products[0])
+        self.assertRedirects(response, reverse('add-to-cart'))
+        self.add(self.products[0])
+        self.add(self.products[1])
+        self.assertFalse(Cart.objects.exists())
+
+        response = self.client.get(reverse('add-to-cart'))
+        self.assertEqual(
+            [(item.product, item.quantity) for item in response.context['cart_items']],
+            [(self.products[0], 2), (self.products[1], 1)],
+        )
+        self.assertEqual(response.context['amount'], 900 * 2 + 901)
+
+    def test_quantity_changes_and_api(self):
+        self.add(self.products[0])
+        self.client.get(reverse('update-cart-quantity', args=[self.products[0].id, 'inc']))
+        data = self.client.post(reverse('cart-update-api'), {
+            'cart_id': self.products[0].id, 'action': 'inc',
+        }).json()
+        self.assertEqual((data['quantity'], data['amount']), (3, 2700))
+
+        self.client.get(reverse('remove-from-cart', args=[self.products[0].id]))
+        response = self.client.get(reverse('add-to-cart'))
+        self.assertEqual(response.context['cart_items'], [])
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies[cart.ANON_CART_COOKIE] = '1-99:forged'
+        response = self.client.get(reverse('add-to-cart'))
+        self.assertEqual(response.context['cart_items'], [])
+
+    def test_login_merges_into_cart_table(self):
+        Cart.objects.create(user=self.user, product=self.products[0], quantity=5)
+        self.add(self.products[0])
+        self.add(self.products[1])
+
+        response = self.client.post(reverse('login'), {
+            'username': 'shopper', 'password': 'pass12345',
+        })
+        self.assertEqual(response.cookies[cart.ANON_CART_COOKIE].value, '')
+        self.assertEqual(
+            dict(Cart.objects.filter(user=self.user).values_list('product_id', 'quantity')),
+            {self.products[0].id: 6, self.products[1].id: 1},
+        )
+
+
+class CartBadgeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='pass12345')
+        self.customer = Customer.objects.create(
+            user=self.user, name='Buyer', locality='Street 1', city='Lahore',
+            zipcode=54000, state='Punjab',
+        )
+        self.products = make_products(3)
+        self.client.force_login(self.user)
+
+    def assertNoDrift(self):
+        self.assertEqual(cache.get(cart.BADGE_KEY % self.user.pk), cart_totals(self.user.pk))
+
+    def line_id(self, product):
+        return Cart.objects.get(user=self.user, product=product).id
+
+    def test_badge_tracks_every_cart_mutation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for product in self.products:
+                self.client.get(reverse('add-to-cart'), {'product_id': product.id})
+        self.assertNoDrift()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('update-cart-quantity', args=[self.line_id(self.products[0]), 'inc']))
+        self.assertNoDrift()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('cart-update-api'), {
+                'cart_id': self.line_id(self.products[1]), 'action': 'dec',
+            })
+        self.assertNoDrift()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('remove-from-cart', args=[self.line_id(self.products[2])]))
+        self.assertNoDrift()
+        self.assertEqual(cache.get(cart.BADGE_KEY % self.user.pk)['count'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('payment-done'), {
+                'custid': self.customer.id, 'payment_method': 'COD',
+            })
+        self.assertNoDrift()
+        self.assertEqual(cache.get(cart.BADGE_KEY % self.user.pk)['count'], 0)
+
+    def test_checkout_refreshes_badge_once(self):
+        Cart.objects.bulk_create([Cart(user=self.user, product=product) for product in self.products])
+        cart.refresh_cart_badge(self.user.pk)  # so the page render reads the cache
+        with mock.patch.object(cart, 'refresh_cart_badge', wraps=cart.refresh_cart_badge) as refresh, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('payment-done'), {
+                'custid': self.customer.id, 'payment_method': 'COD',
+            })
+        refresh.assert_called_once_with(self.user.pk)
+        self.assertNoDrift()
+
+    def test_rolled_back_change_does_not_hold_back_later_refreshes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_product(self.user, self.products[0])
+        try:
+            with transaction.atomic():
+                cart.add_product(self.user, self.products[1])
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_product(self.user, self.products[2])
+        self.assertNoDrift()
+        self.assertEqual(cache.get(cart.BADGE_KEY % self.user.pk)['count'], 2)
+
+    def test_deleting_product_in_cart_refreshes_badge(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for product in self.products[:2]:
+                cart.add_product(self.user, product)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].delete()
+        self.assertNoDrift()
+        self.assertEqual(cache.get(cart.BADGE_KEY % self.user.pk)['count'], 1)
+
+    def test_editing_cart_row_directly_refreshes_badge(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_product(self.user, self.products[0])
+        line = Cart.objects.get(user=self.user, product=self.products[0])
+        line.quantity = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            line.save()
+        self.assertNoDrift()
+        self.assertEqual(cache.get(cart.BADGE_KEY % self.user.pk)['count'], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line.delete()
+        self.assertNoDrift()
+        self.assertEqual(cache.get(cart.BADGE_KEY % self.user.pk)['count'], 0)
+
+    def test_price_change_drops_badges_of_carts_holding_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_product(self.user, self.products[0])
+        others = User.objects.bulk_create([User(username=f'other{i}') for i in range(5)])
+        Cart.objects.bulk_create([Cart(user=other, product=self.products[0]) for other in others])
+        product = self.products[0]
+        product.discounted_price = 500
+        # the save and its search index rows, then one query for the carts
+        # holding it, none per cart
+        with self.assertNumQueries(4), self.captureOnCommitCallbacks(execute=True):
+            product.save(update_fields=['discounted_price'])
+        self.assertIsNone(cache.get(cart.BADGE_KEY % self.user.pk))
+        self.assertEqual(cart.cart_badge(self.user)['amount'], 500)
+
+    def test_failed_refresh_drops_the_badge_instead_of_raising(self):
+        cart.refresh_cart_badge(self.user.pk)
+        locked = OperationalError('database is locked')
+        with mock.patch.object(cart, 'cart_totals', side_effect=locked), \
+                self.assertLogs('app.cart', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            cart.add_product(self.user, self.products[0])
+        self.assertIsNone(cache.get(cart.BADGE_KEY % self.user.pk))
+        self.assertEqual(cart.cart_badge(self.user)['count'], 1)
+
+    def test_navbar_reads_cached_summary(self):
+        Cart.objects.create(user=self.user, product=self.products[0], quantity=4)
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.context['cart_badge']['count'], 4)
+        self.assertContains(response, '<span class="badge bg-danger">4</span>', html=True)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        os.makedirs(os.path.join(media, 'productimg'))
+        Image.new('RGB', (600, 900), 'red').save(os.path.join(media, 'productimg', 'big.jpg'))
+        self.media = media
+        self.settings_override = override_settings(
+            MEDIA_ROOT=media, IMAGE_DERIVATIVE_WIDTHS=[200, 400, 800], IMAGE_DERIVATIVE_AVIF=False,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def create_product(self):
+        return Product.objects.create(
+            title='Shirt', selling_price=1000, discounted_price=900, description='A shirt',
+            brand='Brand', category='TW', product_image='productimg/big.jpg',
+        )
+
+    def test_save_builds_hashed_copies_without_upscaling(self):
+        product = self.create_product()
+        product.refresh_from_db()
+        variants = product.image_variants['variants']
+        self.assertEqual(set(variants), {'webp', 'jpeg'})
+        self.assertEqual(set(variants['webp']), {'200', '400'})
+        name = variants['webp']['200']
+        self.assertRegex(name, r'^productimg/big\.[0-9a-f]{8}\.200w\.webp$')
+        with Image.open(os.path.join(self.media, name)) as image:
+            self.assertEqual(image.size, (200, 300))
+
+    def test_home_page_uses_srcset(self):
+        self.create_product()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '<source type="image/webp" srcset="/media/productimg/big.')
+        self.assertContains(response, '400w')
+
+    def test_backfill_command(self):
+        product = self.create_product()
+        Product.objects.filter(pk=product.pk).update(image_variants={})
+        out = StringIO()
+        call_command('build_image_derivatives', workers=1, report=True, stdout=out)
+        product.refresh_from_db()
+        self.assertIn('200', product.image_variants['variants']['webp'])
+        self.assertIn('Updated 1 products', out.getvalue())
+        self.assertIn('Home page images (1 products)', out.getvalue())
+
+
+class StaticAssetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(STATIC_ROOT=cls.static_root)
+        cls.settings_override.enable()
+        # all.min.css refers to webfonts the repo does not ship; keep the run quiet
+        logging.disable(logging.WARNING)
+        try:
+            call_command('collectstatic', interactive=False, verbosity=0)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.static_root)
+        super().tearDownClass()
+
+    def get(self, path, **headers):
+        handler = StaticAssetsHandler(lambda environ, start_response: [b'passed through'])
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', **headers}
+        body = b''.join(handler(environ, start_response))
+        return response.get('status'), response.get('headers', {}), body
+
+    def test_hashed_names_and_precompressed_siblings(self):
+        url = staticfiles_storage.url('app/css/style.css')
+        self.assertRegex(url, r'^/static/app/css/style\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(staticfiles_storage.path(url[len('/static/'):] + '.gz')))
+
+    def test_serves_gzip_with_far_future_cache(self):
+        url = staticfiles_storage.url('app/css/style.css')
+        status, headers, body = self.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        with open(staticfiles_storage.path('app/css/style.css'), 'rb') as fh:
+            self.assertEqual(gzip.decompress(body), fh.read())
+
+        status, _, body = self.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+
+    def test_identity_and_unknown_paths(self):
+        url = staticfiles_storage.url('app/css/style.css')
+        status, headers, _ = self.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(self.get('/static/app/missing.css')[2], b'passed through')
+        self.assertEqual(self.get('/')[2], b'passed through')
+
+    def test_malformed_and_wildcard_accept_encoding(self):
+        url = staticfiles_storage.url('app/css/style.css')
+        status, headers, _ = self.get(url, HTTP_ACCEPT_ENCODING='gzip;q=abc')
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('Content-Encoding', headers)
+
+        _, headers, _ = self.get(url, HTTP_ACCEPT_ENCODING='*')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        _, headers, _ = self.get(url, HTTP_ACCEPT_ENCODING='*;q=0.5, gzip;q=0')
+        self.assertNotIn('Content-Encoding', headers)
+        _, headers, _ = self.get(url, HTTP_ACCEPT_ENCODING='identity, *;q=0')
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_weak_etag_in_if_none_match(self):
+        url = staticfiles_storage.url('app/css/style.css')
+        _, headers, _ = self.get(url)
+        status, _, body = self.get(url, HTTP_IF_NONE_MATCH=f'"other", W/{headers["ETag"]}')
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+
+    def test_asgi_handler_serves_the_same_files(self):
+        url = staticfiles_storage.url('app/css/style.css')
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': url, 'headers': [(b'accept-encoding', b'gzip')]}
+        async_to_sync(AsyncStaticAssetsHandler(None))(scope, None, send)
+        headers = dict(messages[0]['headers'])
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(headers[b'content-encoding'], b'gzip')
+        self.assertIn(b'immutable', headers[b'cache-control'])
+        with open(staticfiles_storage.path('app/css/style.css'), 'rb') as fh:
+            self.assertEqual(gzip.decompress(b''.join(m['body'] for m in messages[1:])), fh.read())
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        os.makedirs(os.path.join(media, 'productimg'))
+        self.data = bytes(range(256)) * 40
+        with open(os.path.join(media, 'productimg', 'a.jpg'), 'wb') as fh:
+            fh.write(self.data)
+        self.settings_override = override_settings(MEDIA_ROOT=media, MEDIA_SERVE_MODE='django')
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.url = reverse('media', args=['productimg/a.jpg'])
+
+    def test_full_response_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # a stale If-Range gets the whole (changed) file
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_proxy_modes_and_missing_files(self):
+        with self.settings(MEDIA_SERVE_MODE='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/productimg/a.jpg')
+        self.assertEqual(response.content, b'')
+
+        with open(os.path.join(settings.MEDIA_ROOT, 'productimg', 'blue shirt é.jpg'), 'wb') as fh:
+            fh.write(self.data)
+        with self.settings(MEDIA_SERVE_MODE='x-accel-redirect'):
+            response = self.client.get(reverse('media', args=['productimg/blue shirt é.jpg']))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/productimg/blue%20shirt%20%C3%A9.jpg')
+        self.assertEqual(self.client.get(reverse('media', args=['productimg/nope.jpg'])).status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        make_products(3)
+
+    def test_server_timing_and_metrics_endpoint(self):
+        response = self.client.get(reverse('mobile'))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+        url = reverse('request-metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)  # staff only
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        views = self.client.get(url).json()['views']
+        self.assertEqual(views['mobile']['count'], 1)
+        self.assertGreaterEqual(views['mobile']['p99_ms'], views['mobile']['p50_ms'])
+
+    @override_settings(REQUEST_QUERY_BUDGETS={'mobile': 0}, REQUEST_QUERY_BUDGET_RAISE=True)
+    def test_query_budget_can_fail_tests(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'mobile ran'):
+            self.client.get(reverse('mobile'))
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+    async def test_async_views_count_worker_thread_queries(self):
+        # the ORM calls run on a sync_to_async thread with its own connection
+        response = await self.async_client.get(reverse('mobile'))
+        queries = int(response['Server-Timing'].rsplit('desc="', 1)[1].split()[0])
+        self.assertGreater(queries, 0)
+        self.assertGreater(metrics.snapshot()['mobile']['queries_max'], 0)
+
+    @override_settings(REQUEST_QUERY_BUDGETS={'mobile': 0}, REQUEST_QUERY_BUDGET_RAISE=True)
+    async def test_query_budget_covers_async_views(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'mobile ran'):
+            await self.async_client.get(reverse('mobile'))
+
+
+# -------------------------------
+# Per-route query and time budgets
+# -------------------------------
+# Every named route in app/urls.py with the request it is exercised with,
+# the most queries it may issue (enforced by RequestMetricsMiddleware) and
+# its slowest acceptable response time in ms. Adding a route without an
+# entry here fails test_every_route_has_a_budget.
+ROUTE_BUDGETS = {
+    # name: (method, url args, request data, max queries, max ms)
+    # query counts are the measured ones and strict; times are a few times
+    # the measured median, scaled by ROUTE_TIME_BUDGET_SCALE below
+    # cold cache: renders every product into the five sliders
+    'home': ('get', [], {}, 4, 2000),
+    'product-detail': ('get', ['product'], {}, 4, 50),
+    'add-to-cart': ('get', [], {}, 4, 75),
+    'buy-now': ('get', [], {'product_id': 'product'}, 5, 50),
+    'profile': ('get', [], {}, 4, 50),
+    'address': ('get', [], {}, 4, 50),
+    'orders': ('get', [], {}, 6, 75),
+    'changepassword': ('get', [], {}, 3, 50),
+    'mobile': ('get', [], {}, 4, 75),
+    'mobiledata': ('get', ['Samsung'], {}, 4, 75),
+    'topwear': ('get', [], {}, 4, 75),
+    'topweardata': ('get', ['below'], {}, 4, 75),
+    'bottomwear': ('get', [], {}, 4, 75),
+    'bottomweardata': ('get', ['above'], {}, 4, 75),
+    'shoes': ('get', [], {}, 4, 75),
+    'shoesdata': ('get', ['Brand'], {}, 4, 75),
+    'laptop': ('get', [], {}, 4, 75),
+    'laptopdata': ('get', ['below'], {}, 4, 75),
+    'login': ('get', [], {}, 3, 50),
+    # logout and clear-profiles cascade through the fixture's 1000 orders,
+    # deleted 100 per statement, so their counts follow the dataset size
+    'logout': ('get', [], {}, 21, 200),
+    'customerregistration': ('get', [], {}, 3, 50),
+    'checkout': ('get', [], {}, 5, 50),
+    'payment-done': ('post', [], {'custid': 'customer', 'payment_method': 'COD'}, 12, 75),
+    'search': ('get', [], {'q': 'product 12'}, 4, 50),
+    # includes building the in-memory suggest index
+    'search-suggest': ('get', [], {'q': 'prod'}, 1, 300),
+    'cart-update-api': ('post', [], {'cart_id': 'cart', 'action': 'inc'}, 4, 50),
+    'request-metrics': ('get', [], {}, 2, 50),
+    'order-status-bulk': ('post', [], {}, 4, 50),
+    'remove-from-cart': ('get', ['cart'], {}, 4, 50),
+    'update-cart-quantity': ('get', ['cart', 'dec'], {}, 5, 50),
+    'track-order': ('get', [], {'tracking_id': 'tracking'}, 7, 75),
+    'csrf-debug': ('get', [], {}, 3, 50),
+    'cancel-order': ('post', ['order'], {}, 8, 50),
+    'return-order': ('post', ['order'], {}, 8, 50),
+    'forgot-password': ('get', [], {}, 3, 50),
+    'clear-profiles': ('get', [], {}, 19, 200),
+    'media': ('get', ['productimg/download.jpg'], {}, 0, 50),
+}
+
+# machine-readable results, for tracking budgets over time; written only
+# when the run asks for it, e.g. PERF_REPORT=/tmp/perf-report.json
+PERF_REPORT = os.environ.get('PERF_REPORT')
+# requests per route; the time budget applies to their median
+ROUTE_SAMPLES = 5
+# multiplier on the time budgets, for slower or loaded runners; 0 skips them
+ROUTE_TIME_BUDGET_SCALE = float(os.environ.get('ROUTE_TIME_BUDGET_SCALE', 4))
+
+
+@override_settings(
+    REQUEST_QUERY_BUDGETS={name: budget[3] for name, budget in ROUTE_BUDGETS.items()},
+    REQUEST_QUERY_BUDGET_RAISE=True,
+)
+class RouteBudgetTests(TestCase):
+    PRODUCTS, USERS, CART_LINES, ORDERS_PER_USER, LINES_PER_ORDER = 5000, 100, 20, 10, 3
+    results = {}  # route name -> measurements, written to PERF_REPORT if set
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = ['M', 'L', 'TW', 'BW', 'S']
+        products = Product.objects.bulk_create([
+            Product(
+                title=f'Product {i}', selling_price=2000, discounted_price=500 + i % 1500,
+                description='A product', brand=['Samsung', 'Brand'][i % 2],
+                category=categories[i % len(categories)], product_image='productimg/download.jpg',
+            )
+            for i in range(cls.PRODUCTS)
+        ], batch_size=1000)
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(cls.USERS)])
+        cls.user = users[0]
+        cls.user.is_staff = cls.user.is_superuser = True
+        cls.user.set_password('pw')
+        cls.user.save()
+        customers = Customer.objects.bulk_create([
+            Customer(user=user, name=user.username, locality='Street', city='City',
+                     zipcode=12345, state='Punjab')
+            for user in users
+        ])
+        Cart.objects.bulk_create([
+            Cart(user=user, product=products[(u * 37 + i) % cls.PRODUCTS], quantity=1 + i % 3)
+            for u, user in enumerate(users) for i in range(cls.CART_LINES)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(user=user, customer=customer, status='Accepted', payment_method='COD', total=1000)
+            for user, customer in zip(users, customers) for _ in range(cls.ORDERS_PER_USER)
+        ])
+        OrderLine.objects.bulk_create([
+            OrderLine(order=order, product=products[(o * 7 + i) % cls.PRODUCTS], quantity=1, price=500)
+            for o, order in enumerate(orders) for i in range(cls.LINES_PER_ORDER)
+        ])
+        cls.objects = {
+            'product': products[0].pk,
+            'customer': customers[0].pk,
+            'cart': Cart.objects.filter(user=cls.user).first().pk,
+            'order': orders[0].pk,
+            'tracking': orders[0].tracking_id,
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        if PERF_REPORT and cls.results:
+            with open(PERF_REPORT, 'w') as fh:
+                json.dump({
+                    'generated_at': timezone.now().isoformat(),
+                    'dataset': {
+                        'products': cls.PRODUCTS, 'users': cls.USERS, 'cart_lines_per_user': cls.CART_LINES,
+                        'orders': cls.USERS * cls.ORDERS_PER_USER,
+                        'order_lines': cls.USERS * cls.ORDERS_PER_USER * cls.LINES_PER_ORDER,
+                    },
+                    'routes': cls.results,
+                }, fh, indent=2, sort_keys=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        suggest.index.reset()
+
+    def resolve(self, value):
+        return self.objects.get(value, value)
+
+    def test_every_route_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+        self.assertEqual(names - set(ROUTE_BUDGETS), set())
+
+    def test_routes_stay_within_budget(self):
+        self.client.force_login(self.user)
+        for name, (method, args, data, max_queries, max_ms) in ROUTE_BUDGETS.items():
+            with self.subTest(route=name):
+                url = reverse(name, args=[self.resolve(arg) for arg in args])
+                data = {key: self.resolve(value) for key, value in data.items()}
+                metrics.reset()
+                for _ in range(ROUTE_SAMPLES):
+                    cache.clear()
+                    # each request is rolled back so mutating routes don't affect the next
+                    with transaction.atomic():
+                        response = getattr(self.client, method)(url, data)
+                        transaction.set_rollback(True)
+                    self.client.force_login(self.user)  # logout/clear routes drop the session
+                    self.assertLess(response.status_code, 500)
+                sample = metrics.snapshot()[name]
+                self.results[name] = {
+                    'status': response.status_code, 'queries': sample['queries_max'],
+                    'ms': sample['p50_ms'], 'max_queries': max_queries, 'max_ms': max_ms,
+                }
+                if ROUTE_TIME_BUDGET_SCALE:
+                    self.assertLessEqual(sample['p50_ms'], max_ms * ROUTE_TIME_BUDGET_SCALE)
+
+
+class SeedDataTests(TestCase):
+    def seed(self):
+        call_command('seed_data', products=50, users=10, orders=40, batch_size=16, seed=7, stdout=StringIO())
+
+    def test_seeds_consistent_rows(self):
+        self.seed()
+        self.assertEqual(Product.objects.count(), 50)
+        self.assertEqual(Customer.objects.filter(user__username__startswith='seed').count(), 10)
+        self.assertEqual(Order.objects.count(), 40)
+        order = Order.objects.prefetch_related('lines').first()
+        self.assertEqual(order.customer.user_id, order.user_id)
+        self.assertAlmostEqual(order.subtotal, sum(line.line_total for line in order.lines.all()))
+        self.assertEqual(order.total, order.subtotal + order.shipping)
+        # history spans the past instead of "now"
+        self.assertLess(Order.objects.earliest('ordered_date').ordered_date, timezone.now() - timedelta(days=300))
+        self.assertTrue(self.client.login(username=order.user.username, password='password'))
+
+    def test_same_seed_same_data(self):
+        self.seed()
+        first = list(Product.objects.order_by('id').values_list('title', 'discounted_price'))
+        tracking = list(Order.objects.order_by('id').values_list('tracking_id', flat=True))
+        Order.objects.all().delete()
+        Product.objects.all().delete()
+        User.objects.all().delete()
+        self.seed()
+        self.assertEqual(list(Product.objects.order_by('id').values_list('title', 'discounted_price')), first)
+        self.assertEqual(list(Order.objects.order_by('id').values_list('tracking_id', flat=True)), tracking)
+
+
+class DatabaseProfileTests(TestCase):
+    def test_default_profile_applied_to_connections(self):
+        self.assertEqual(settings.DATABASE_PROFILE, 'default')
+        pragmas = current_pragmas(connection)
+        self.assertEqual(pragmas['busy_timeout'], 20000)
+        self.assertEqual(pragmas['cache_size'], -64000)
+        self.assertEqual(pragmas['temp_store'], 2)  # MEMORY
+        self.assertEqual(connection.settings_dict['OPTIONS'], {'transaction_mode': 'IMMEDIATE'})
+        self.assertEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 60)
+        self.assertTrue(settings.DATABASES['default']['CONN_HEALTH_CHECKS'])
+
+    def test_tuned_pragmas_applied_to_connections(self):
+        with override_settings(DATABASE_PROFILE='tuned'):
+            new = connections.create_connection('default')
+            self.addCleanup(new.close)
+            new.ensure_connection()  # connection_created applies the profile
+        pragmas = current_pragmas(new)
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+        self.assertEqual(pragmas['busy_timeout'], 20000)
+        self.assertEqual(pragmas['cache_size'], -64000)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = make_products(3, category='M')
+        search.rebuild_index()  # bulk_create skips the indexing signals
+        self.user = User.objects.create_user('async-buyer')
+        customer = Customer.objects.create(
+            user=self.user, name='Buyer', locality='Street 1', city='Lahore',
+            zipcode=54000, state='Punjab',
+        )
+        self.order = Order.objects.create(user=self.user, customer=customer, total=500)
+        OrderLine.objects.create(order=self.order, product=self.products[0], quantity=1, price=500)
+        Cart.objects.create(user=self.user, product=self.products[1], quantity=2)
+
+    async def test_catalogue_views_render_under_the_async_stack(self):
+        await self.async_client.aforce_login(self.user)
+        pages = [
+            (reverse('home'), 'Product 0'),
+            (reverse('product-detail', args=[self.products[1].pk]), 'Product 1'),
+            (reverse('mobile'), 'Product 2'),
+            (reverse('search') + '?q=product', 'Product 2'),
+            (reverse('track-order') + f'?tracking_id={self.order.tracking_id}', 'Product 0'),
+        ]
+        for url, text in pages:
+            response = await self.async_client.get(url)
+            self.assertContains(response, text)
+            # the navbar badge and user were loaded before rendering
+            self.assertEqual(response.context['cart_badge']['count'], 2)
+
+    async def test_unknown_tracking_id_shows_message(self):
+        response = await self.async_client.get(reverse('track-order'), {'tracking_id': 'nope'})
+        self.assertContains(response, 'No orders found for that tracking id')
+
+
+class ProductPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        product_page.hits.reset()
+        self.product = make_products(1)[0]
+        self.url = reverse('product-detail', args=[self.product.pk])
+
+    def test_anonymous_revalidation_skips_queries_and_templates(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+            cached = self.client.get(self.url)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(
+            product_page.hits.snapshot(),
+            {'rendered': 1, 'not_modified': 1, 'cached': 1, 'total': 3, 'without_templates': 0.6667},
+        )
+
+    def test_save_changes_the_page_and_its_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.product.title = 'Renamed phone'
+        self.product.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Renamed phone')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cart_count_is_part_of_the_etag(self):
+        user = User.objects.create_user('etag-buyer')
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertNotIn('Last-Modified', response)
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_product(user, self.product)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_missing_product_is_404(self):
+        self.assertEqual(self.client.get(reverse('product-detail', args=[self.product.pk + 1])).status_code, 404)
+
+
+class OrderStatusPipelineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('warehouse', is_staff=True)
+        customer = Customer.objects.create(
+            user=self.user, name='Buyer', locality='Street 1', city='Lahore',
+            zipcode=54000, state='Punjab',
+        )
+        self.orders = Order.objects.bulk_create([
+            Order(user=self.user, customer=customer, status=status, total=100)
+            for status in ['Accepted', 'Accepted', 'Packed', 'On The Way', 'Pending']
+        ])
+
+    def statuses(self):
+        return [order.status for order in Order.objects.order_by('id')]
+
+    def test_state_machine(self):
+        self.assertTrue(order_status.can_transition('Pending', 'Accepted'))
+        self.assertTrue(order_status.can_transition('Packed', 'Cancel'))
+        self.assertFalse(order_status.can_transition('On The Way', 'Cancel'))
+        self.assertFalse(order_status.can_transition('Accepted', 'Delivered'))
+        self.assertFalse(order_status.can_transition('Delivered', 'Pending'))
+        self.assertTrue(order_status.can_transition('Delivered', 'Returned'))
+        self.assertFalse(order_status.can_transition('Cancel', 'Returned'))
+
+    def test_command_applies_valid_rows_in_chunks(self):
+        a, b, c, d, e = (order.tracking_id for order in self.orders)
+        rows = [
+            'tracking_id,status',
+            f'{a},Packed', f'{a},On The Way',  # two steps of one order
+            f'{b},Delivered',                  # skips steps
+            f'{c},Packed',                     # already there
+            f'{d},Delivered', f'{e},Cancel',
+            'no-such-order,Packed', f'{b},Lost',
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write('\n'.join(rows) + '\n')
+        self.addCleanup(os.remove, fh.name)
+        out = StringIO()
+        # 3 chunks of savepoint, read, release, plus one UPDATE per (old, new) pair
+        # and one event INSERT per chunk that applied something
+        with self.assertNumQueries(3 * 3 + 3 + 2):
+            call_command('update_order_status', fh.name, chunk_size=3, stdout=out)
+        self.assertEqual(self.statuses(), ['On The Way', 'Accepted', 'Packed', 'Delivered', 'Cancel'])
+        self.assertIn('8 rows', out.getvalue())
+        self.assertIn('4 applied to 3 orders, 1 unchanged, 3 rejected', out.getvalue())
+        self.assertIn('Accepted -> Delivered not allowed', out.getvalue())
+
+    def test_api_takes_jsonl(self):
+        self.client.force_login(self.user)
+        body = '\n'.join(json.dumps({'tracking_id': order.tracking_id, 'status': 'Packed'}) for order in self.orders)
+        report = self.client.post(
+            reverse('order-status-bulk'), body, content_type='application/x-ndjson',
+        ).json()
+        self.assertEqual((report['applied'], report['unchanged'], report['rejected']), (2, 1, 2))
+        self.assertEqual(self.statuses()[:3], ['Packed', 'Packed', 'Packed'])
+
+    def test_api_rejects_rows_that_are_not_utf8(self):
+        self.client.force_login(self.user)
+        a, b = self.orders[0].tracking_id, self.orders[1].tracking_id
+        # a BOM, then a cp1252 row ("Packé") next to a good one
+        body = '\ufefftracking_id,status\n'.encode('utf-8') + f'{a},Pack\xe9\n{b},Packed\n'.encode('cp1252')
+        response = self.client.post(reverse('order-status-bulk'), body, content_type='text/csv')
+        report = response.json()
+        self.assertEqual((report['rows'], report['applied'], report['rejected']), (2, 1, 1))
+        self.assertEqual(report['rejected_by_reason'], {'unreadable row': 1})
+        self.assertEqual(self.statuses()[:2], ['Accepted', 'Packed'])
+
+
+class OrderEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tracker', password='pw')
+        self.customer = Customer.objects.create(
+            user=self.user, name='Buyer', locality='Street 1', city='Lahore',
+            zipcode=54000, state='Punjab',
+        )
+        Cart.objects.create(user=self.user, product=make_products(1)[0], quantity=1)
+
+    def history(self, order):
+        return list(order.events.order_by('created_at', 'id').values_list('status', 'source'))
+
+    def test_every_status_change_is_logged(self):
+        order = place_order(self.user, self.customer, 'COD').order
+        self.assertEqual(self.history(order), [('Accepted', 'checkout')])
+        self.assertEqual(order.events.get().created_at, order.status_changed_at)
+
+        order_status.apply_status_updates([
+            (1, order.tracking_id, 'Packed'), (2, order.tracking_id, 'On The Way'), (3, order.tracking_id, 'Delivered'),
+        ])
+        self.client.force_login(self.user)
+        self.client.post(reverse('return-order', args=[order.id]))
+        self.assertEqual(self.history(order), [
+            ('Accepted', 'checkout'), ('Packed', 'warehouse'), ('On The Way', 'warehouse'),
+            ('Delivered', 'warehouse'), ('Returned', 'customer'),
+        ])
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'Returned')
+        self.assertEqual(order.status_changed_at, order.events.latest('created_at', 'id').created_at)
+
+    def test_admin_status_edit_is_logged(self):
+        order = place_order(self.user, self.customer, 'COD').order
+        admin = OrderModelAdmin(Order, None)
+        form = admin.get_form(None, order, change=True, fields=['status'])(
+            {'status': 'Packed'}, instance=order,
+        )
+        self.assertTrue(form.is_valid())
+        admin.save_model(None, form.save(commit=False), form, change=True)
+        self.assertEqual(self.history(order)[-1], ('Packed', 'admin'))
+
+    def test_events_are_append_only(self):
+        order = place_order(self.user, self.customer, 'COD').order
+        event = order.events.get()
+        with self.assertRaises(TypeError):
+            event.save()
+        with self.assertRaises(TypeError):
+            OrderEvent.objects.filter(order=order).update(status='Delivered')
+        with self.assertRaises(TypeError):
+            OrderEvent.objects.all().delete()
+        order.delete()
+        self.assertFalse(OrderEvent.objects.exists())
+
+    def test_tracking_page_shows_timeline(self):
+        order = place_order(self.user, self.customer, 'COD').order
+        order_events.set_status(order, 'Packed', 'warehouse')
+        with self.assertNumQueries(4):  # order, lines, products, events
+            order = (
+                Order.objects.filter(pk=order.pk)
+                .prefetch_related('lines__product', order_events.timeline_prefetch()).first()
+            )
+        self.assertEqual([event.status for event in order.events.all()], ['Accepted', 'Packed'])
+        response = self.client.get(reverse('track-order'), {'tracking_id': order.tracking_id})
+        self.assertContains(response, '<strong>Accepted</strong>', html=False)
+        self.assertContains(response, '<strong>Packed</strong>', html=False)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('exporter', 'exporter@example.com', 'pw')
+        customer = Customer.objects.create(
+            user=self.admin, name='Buyer, Jr.', locality='Street 1', city='Lahore',
+            zipcode=54000, state='Punjab',
+        )
+        self.orders = Order.objects.bulk_create([
+            Order(user=self.admin, customer=customer, status='Accepted', total=100 + i) for i in range(5)
+        ])
+
+    def test_csv_is_streamed_in_one_query(self):
+        with self.assertNumQueries(1):
+            text = ''.join(exports.stream(exports.EXPORTS['orders'], chunk_size=2))
+        lines = text.splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'tracking_id', 'user', 'customer'])
+        self.assertEqual(len(lines), 6)
+        self.assertIn('"Buyer, Jr."', lines[1])
+
+    def test_blocks_group_lines(self):
+        lines = ['x' * 1000 + '\n'] * 200
+        blocks = list(exports.blocks(lines))
+        self.assertEqual(''.join(blocks), ''.join(lines))
+        self.assertGreater(len(blocks), 1)
+        for block in blocks[:-1]:
+            self.assertTrue(exports.BLOCK_SIZE <= len(block) < exports.BLOCK_SIZE + 1001)
+
+    def test_admin_action_streams_selected_rows(self):
+        self.client.force_login(self.admin)
+        selected = self.orders[:2]
+        response = self.client.post(reverse('admin:app_order_changelist'), {
+            'action': 'export_jsonl',
+            '_selected_action': [order.pk for order in selected],
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([record['tracking_id'] for record in records], [order.tracking_id for order in selected])
+        self.assertEqual(records[0]['customer'], 'Buyer, Jr.')
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'customers.jsonl')
+            out = StringIO()
+            call_command('export_data', 'customers', output=path, stdout=out)
+            with open(path, encoding='utf-8') as fh:
+                records = [json.loads(line) for line in fh]
+        self.assertEqual(records, [{
+            'id': records[0]['id'], 'user': 'exporter', 'name': 'Buyer, Jr.', 'locality': 'Street 1',
+            'city': 'Lahore', 'zipcode': 54000, 'state': 'Punjab',
+        }])
+        self.assertIn('customers ->', out.getvalue())
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_lookups_use_indexes(self):
+        user = User.objects.create_user('planner')
+        lookups = {
+            'order_user_date_idx': Order.objects.filter(user=user).order_by('-ordered_date'),
+            'product_cat_id_idx': Product.objects.filter(category__in=['M', 'L']).order_by('category', 'id'),
+            'app_auth_user_email_idx': User.objects.filter(email='planner@example.com'),
+            'orderevent_order_time_idx': order_events.timeline_prefetch().queryset.filter(order_id=1),
+        }
+        for index, queryset in lookups.items():
+            plan = queryset.explain()
+            self.assertIn(index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+@override_settings(DATABASES={**settings.DATABASES, 'replica': {**settings.DATABASES['default']}})
+class ReplicaRoutingTests(TransactionTestCase):
+    # routing decisions only; no queries are sent to the (unconfigured) replica.
+    # TransactionTestCase: TestCase's wrapping transaction would pin every read
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_db_during(self, request, action=None):
+        seen = {}
+
+        def view(request):
+            if action:
+                action()
+            seen['db'] = self.router.db_for_read(Product)
+            return HttpResponse()
+
+        response = routers.ReplicaPinMiddleware(view)(request)
+        return seen['db'], response
+
+    def test_catalogue_reads_use_replica_and_writes_primary(self):
+        db, response = self.read_db_during(self.factory.get('/'))
+        self.assertEqual(db, 'replica')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.router.db_for_read(Cart), 'default')
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'app'))
+
+    def test_write_pins_request_and_following_requests(self):
+        db, response = self.read_db_during(
+            self.factory.get('/'), lambda: self.router.db_for_write(Cart),
+        )
+        self.assertEqual(db, 'default')
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        request = self.factory.get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        self.assertEqual(self.read_db_during(request)[0], 'default')
+        # the pin is per request context
+        self.assertEqual(self.read_db_during(self.factory.get('/'))[0], 'replica')
+
+    def test_transactions_and_session_writes(self):
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+        db, response = self.read_db_during(
+            self.factory.get('/'), lambda: self.router.db_for_write(Session),
+        )
+        self.assertEqual(db, 'replica')
+
+
+class ReplicaMetricsTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # a live replica alias on the test database, so reads really go there;
+        # added after the runner has set up its databases
+        replica = dict(connections['default'].settings_dict)
+        connections.settings['replica'] = replica
+        cls.databases = {'default', 'replica'}
+        cls.addClassCleanup(cls.drop_replica)
+        override = override_settings(DATABASES={**settings.DATABASES, 'replica': replica})
+        override.enable()
+        cls.addClassCleanup(override.disable)
+        super().setUpClass()
+
+    @classmethod
+    def drop_replica(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def test_replica_queries_are_counted(self):
+        make_products(2)
+
+        def view(request):
+            return HttpResponse(str(len(Product.objects.all())))
+
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = RequestMetricsMiddleware(routers.ReplicaPinMiddleware(view))(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'2')
+        self.assertEqual(len(replica_queries), 1)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
 
-# Create your tests here.
@@ -1,8 +1,7 @@
 # from django.contrib import admin
 from django.urls import path
 from django.conf import settings
-from django.conf.urls.static import static
-from app import views
+from app import media, views
 
 urlpatterns = [
     # path('', views.home),
@@ -30,7 +29,10 @@ urlpatterns = [
     path('checkout/', views.checkout, name='checkout'),
     path('paymentdone/', views.payment_done, name='payment-done'),
     path('search/', views.search, name='search'),
+    path('api/search/suggest/', views.search_suggest_api, name='search-suggest'),
     path('api/cart/update/', views.cart_update_api, name='cart-update-api'),
+    path('api/metrics/requests/', views.request_metrics_api, name='request-metrics'),
+    path('api/orders/status/', views.order_status_bulk_api, name='order-status-bulk'),
     path('cart/remove/<int:cart_id>/', views.remove_from_cart, name='remove-from-cart'),
     path('cart/update/<int:cart_id>/<str:action>/', views.update_cart_quantity, name='update-cart-quantity'),
     path('trackorder/', views.track_order, name='track-order'),
@@ -39,4 +41,6 @@ urlpatterns = [
     path('order/return/<int:order_id>/', views.return_order, name='return-order'),
     path('forgot-password/', views.forgot_password, name='forgot-password'),
         path('profiles/clear/', views.clear_profiles, name='clear-profiles'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # ✅ uploaded product images (works with DEBUG off too, see app/media.py)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', media.serve_media, name='media'),
+]
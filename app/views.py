@@ -1,123 +1,126 @@
+import logging
+import time
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
-from .models import Customer, Product, Cart, OrderPlaced
-from django.db.models import Q
-from django.http import JsonResponse
-import uuid
+from .models import Customer, Product, Cart, Order, OrderLine
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.urls import reverse
 from .forms import CustomerRegistrationForm
+from . import cart
+from .catalog import category_listing
+from .checkout import place_order
+from .home_cache import aget_home_fragments
+from .pricing import anonymous_cart_summary, cart_summary, line_summary, order_amounts, shipping_for
+from .search import asearch_products
+from .shortcuts import arender
+from . import order_events, order_status, product_page, suggest
+from .middleware import metrics
 from django.middleware.csrf import get_token
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.utils.crypto import get_random_string
 
+logger = logging.getLogger(__name__)
+
 
-# ✅ Home Page View (Class-Based)
+# ✅ Home Page View (Class-Based, async like the other catalogue views, see onlineshopping/asgi.py)
 class ProductView(View):
-    def get(self, request):
-        topwears = Product.objects.filter(category='TW')
-        bottomwears = Product.objects.filter(category='BW')
-        mobiles = Product.objects.filter(category='M')
-        laptops = Product.objects.filter(category='L')
-        shoes = Product.objects.filter(category='S')
-
-        return render(
-            request,
-            'app/home.html',
-            {
-                'topwears': topwears,
-                'bottomwears': bottomwears,
-                'mobiles': mobiles,
-                'laptops': laptops,
-                'shoes': shoes,
-            }
-        )
+    async def get(self, request):
+        # per-category sliders come pre-rendered from the cache
+        return await arender(request, 'app/home.html', {
+            'sections': await aget_home_fragments(),
+        })
 
 
-# ✅ Product Detail View
+# ✅ Product Detail View (ETag/304 and a rendered-page cache, see app/product_page.py)
 class ProductDetailView(View):
-    def get(self, request, pk):
-        product = Product.objects.get(pk=pk)
-        return render(request, 'app/productdetail.html', {'product': product})
+    async def get(self, request, pk):
+        return await product_page.product_detail(request, pk)
 
 
 # ✅ Other Views
 def add_to_cart(request):
-    """Add a product to the logged-in user's cart (via ?product_id=) or
-    render the cart page showing current cart items.
-    """
-    if not request.user.is_authenticated:
-        # Redirect anonymous users to login page
-        return redirect('login')
+    """Add a product to the cart (via ?product_id=) or render the cart page.
 
+    Logged-in users' carts live in the Cart table; anonymous visitors get a
+    signed-cookie cart that is merged into the table when they log in.
+    """
     # If product_id provided, add/update cart and redirect to cart page
     product_id = request.GET.get('product_id')
     if product_id:
         try:
             product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+        except (Product.DoesNotExist, ValueError):
             return redirect('home')
 
-        cart_item, created = Cart.objects.get_or_create(user=request.user, product=product)
-        if not created:
-            cart_item.quantity = cart_item.quantity + 1
-            cart_item.save()
-
-        return redirect('add-to-cart')
+        if not request.user.is_authenticated:
+            lines = cart.load_anonymous_cart(request)
+            lines[product.id] = lines.get(product.id, 0) + 1
+            return cart.save_anonymous_cart(redirect('add-to-cart'), lines)
 
-    # No product_id -> render the cart page
-    cart_items = Cart.objects.filter(user=request.user).select_related('product')
+        cart.add_product(request.user, product)
 
-    # Compute totals
-    amount = 0
-    shipping = 0
-    for item in cart_items:
-        line = item.quantity * item.product.discounted_price
-        # attach a convenience attribute for template rendering
-        item.line_total = line
-        amount += line
+        return redirect('add-to-cart')
 
-    # simple shipping rule: free over 5000, else fixed 70
-    shipping = 0 if amount > 5000 else 70
-    total = amount + shipping
+    # No product_id -> render the cart page (lines and totals in one query)
+    if request.user.is_authenticated:
+        summary = cart_summary(request.user)
+    else:
+        summary = anonymous_cart_summary(cart.load_anonymous_cart(request))
 
     return render(request, 'app/addtocart.html', {
-        'cart_items': cart_items,
-        'amount': amount,
-        'shipping': shipping,
-        'total': total,
+        'cart_items': summary.items,
+        'amount': summary.amount,
+        'shipping': summary.shipping,
+        'total': summary.total,
     })
 
 
-@login_required
 def remove_from_cart(request, cart_id):
-    """Remove a cart item and redirect back to the cart page."""
-    cart_item = get_object_or_404(Cart, id=cart_id, user=request.user)
-    cart_item.delete()
+    """Remove a cart item and redirect back to the cart page.
+
+    For anonymous carts ``cart_id`` is the product id.
+    """
+    if not request.user.is_authenticated:
+        lines = cart.load_anonymous_cart(request)
+        if not cart.change_anonymous_quantity(lines, cart_id, 'remove'):
+            raise Http404('Cart item not found')
+        return cart.save_anonymous_cart(redirect('add-to-cart'), lines)
+
+    if not cart.remove(request.user, cart_id):
+        raise Http404('Cart item not found')
     return redirect('add-to-cart')
 
 
-@login_required
 def update_cart_quantity(request, cart_id, action):
     """Increase or decrease the quantity of a cart item.
     action should be 'inc' or 'dec'. If quantity reaches 0, remove the item.
+    For anonymous carts ``cart_id`` is the product id.
     """
-    cart_item = get_object_or_404(Cart, id=cart_id, user=request.user)
+    if not request.user.is_authenticated:
+        lines = cart.load_anonymous_cart(request)
+        if not cart.change_anonymous_quantity(lines, cart_id, action):
+            raise Http404('Cart item not found')
+        return cart.save_anonymous_cart(redirect('add-to-cart'), lines)
+
     if action == 'inc':
-        cart_item.quantity += 1
-        cart_item.save()
+        found = cart.increment(request.user, cart_id)
     elif action == 'dec':
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-            cart_item.save()
-        else:
-            cart_item.delete()
+        found = cart.decrement(request.user, cart_id)
+    else:
+        found = Cart.objects.filter(id=cart_id, user=request.user).exists()
+    if not found:
+        raise Http404('Cart item not found')
 
     return redirect('add-to-cart')
 
 
-@login_required
 def cart_update_api(request):
     """AJAX-friendly endpoint to update cart item quantity and return updated totals as JSON."""
     if request.method != 'POST':
@@ -127,55 +130,55 @@ def cart_update_api(request):
     action = request.POST.get('action')
     if not cart_id or not action:
         return JsonResponse({'error': 'cart_id and action required'}, status=400)
+    if action not in ('inc', 'dec'):
+        return JsonResponse({'error': 'invalid action'}, status=400)
+    if not cart_id.isdigit():
+        return JsonResponse({'error': 'invalid cart_id'}, status=400)
 
-    try:
-        cart_item = Cart.objects.get(id=cart_id, user=request.user)
-    except Cart.DoesNotExist:
-        return JsonResponse({'error': 'Cart item not found'}, status=404)
+    if not request.user.is_authenticated:
+        return anonymous_cart_update(request, int(cart_id), action)
 
-    # perform action
+    # perform action (atomic UPDATE, see app/cart.py)
     if action == 'inc':
-        cart_item.quantity += 1
-        cart_item.save()
-    elif action == 'dec':
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-            cart_item.save()
-        else:
-            # if reducing below 1, remove the item
-            cart_item.delete()
-            # indicate the item was removed
-            removed = True
+        found = cart.increment(request.user, cart_id)
     else:
-        return JsonResponse({'error': 'invalid action'}, status=400)
-
-    # recompute totals
-    cart_items = Cart.objects.filter(user=request.user).select_related('product')
-    amount = 0
-    for it in cart_items:
-        amount += it.quantity * it.product.discounted_price
-
-    shipping = 0 if amount > 5000 else 70
-    total = amount + shipping
+        # removes the item when it would drop below 1
+        found = cart.decrement(request.user, cart_id)
+    if not found:
+        return JsonResponse({'error': 'Cart item not found'}, status=404)
 
-    # line total for this item (if still exists)
-    try:
-        new_item = Cart.objects.get(id=cart_id, user=request.user)
-        line_total = new_item.quantity * new_item.product.discounted_price
-        new_quantity = new_item.quantity
-    except Cart.DoesNotExist:
-        line_total = 0
-        new_quantity = 0
+    # recompute this line and the cart totals in one aggregate query
+    summary = line_summary(request.user, cart_id)
 
     return JsonResponse({
         'success': True,
         'cart_id': int(cart_id),
-        'quantity': new_quantity,
-        'line_total': float(line_total),
-        'amount': float(amount),
-        'shipping': float(shipping),
-        'total': float(total),
+        'quantity': summary.quantity,
+        'line_total': float(summary.line_total),
+        'amount': float(summary.amount),
+        'shipping': float(summary.shipping),
+        'total': float(summary.total),
+    })
+
+
+def anonymous_cart_update(request, product_id, action):
+    """``cart_update_api`` for cookie carts, where the line id is the product id."""
+    lines = cart.load_anonymous_cart(request)
+    if not cart.change_anonymous_quantity(lines, product_id, action):
+        return JsonResponse({'error': 'Cart item not found'}, status=404)
+
+    summary = anonymous_cart_summary(lines)
+    line = next((item for item in summary.items if item.id == product_id), None)
+    response = JsonResponse({
+        'success': True,
+        'cart_id': product_id,
+        'quantity': line.quantity if line else 0,
+        'line_total': float(line.line_total) if line else 0.0,
+        'amount': float(summary.amount),
+        'shipping': float(summary.shipping),
+        'total': float(summary.total),
     })
+    return cart.save_anonymous_cart(response, lines)
 
 
 def buy_now(request):
@@ -207,7 +210,7 @@ def buy_now(request):
 
         payment_method = request.POST.get('payment_method') or 'COD'
 
-        # If product_id is provided, create an OrderPlaced for that product
+        # If product_id is provided, create a single-line Order for that product
         if product_id:
             try:
                 product = Product.objects.get(id=product_id)
@@ -215,20 +218,27 @@ def buy_now(request):
                 return redirect('home')
 
             quantity = int(request.POST.get('quantity') or 1)
-            tracking = str(uuid.uuid4())
-            OrderPlaced.objects.create(
-                user=request.user,
-                customer=Customer.objects.get(id=custid),
-                product=product,
-                quantity=quantity,
-                status='Accepted',
-                payment_method=payment_method,
-                tracking_id=tracking,
-            )
+            # same shipping rule as a cart checkout
+            amounts = order_amounts(quantity * product.discounted_price)
+            with transaction.atomic():
+                order = Order.objects.create(
+                    user=request.user,
+                    customer=Customer.objects.get(id=custid),
+                    status='Accepted',
+                    payment_method=payment_method,
+                    **amounts._asdict(),
+                )
+                OrderLine.objects.create(
+                    order=order,
+                    product=product,
+                    quantity=quantity,
+                    price=product.discounted_price,
+                )
+                order_events.record(order, 'checkout')
 
             return render(request, 'app/order_success.html', {
                 'payment_method': payment_method,
-                'tracking_id': tracking,
+                'tracking_id': order.tracking_id,
             })
 
         # If no product_id, behave similar to checkout/payment_done for cart
@@ -247,6 +257,7 @@ def buy_now(request):
     return render(request, 'app/buynow.html', {
         'addresses': addresses,
         'product': product,
+        'shipping': shipping_for(product.discounted_price) if product else 0,
     })
 
 
@@ -302,7 +313,12 @@ def orders(request):
     if not request.user.is_authenticated:
         return redirect('login')
 
-    user_orders = OrderPlaced.objects.filter(user=request.user).select_related('product', 'customer')
+    user_orders = (
+        Order.objects.filter(user=request.user)
+        .select_related('customer')
+        .prefetch_related('lines__product')
+        .order_by('-ordered_date')
+    )
     return render(request, 'app/orders.html', {'orders': user_orders})
 
 
@@ -311,92 +327,71 @@ def change_password(request):
 
 
 # ✅ Mobile View
-def mobile(request, data=None):
-    if data is None:
-        mobiles = Product.objects.filter(category='M')
-    elif data.upper() in ['REDMI', 'SAMSUNG']:
-        mobiles = Product.objects.filter(category='M', brand=data)
-    elif data == 'below':
-        mobiles = Product.objects.filter(category='M', discounted_price__lt=15000)
-    elif data == 'above':
-        mobiles = Product.objects.filter(category='M', discounted_price__gt=15000)
-    else:
-        mobiles = Product.objects.filter(category='M')
-
-    return render(request, 'app/mobile.html', {'mobiles': mobiles})
+async def mobile(request, data=None):
+    return await category_listing(request, 'mobile', data)
 
 
 # Top Wear view
-def topwear(request, data=None):
-    if data is None:
-        topwears = Product.objects.filter(category='TW')
-    elif data == 'below':
-        topwears = Product.objects.filter(category='TW', discounted_price__lt=1000)
-    elif data == 'above':
-        topwears = Product.objects.filter(category='TW', discounted_price__gt=1000)
-    else:
-        topwears = Product.objects.filter(category='TW')
-
-    return render(request, 'app/topware.html', {'topwears': topwears})
+async def topwear(request, data=None):
+    return await category_listing(request, 'topwear', data)
 
 
 # Bottom Wear view
-def bottomwear(request, data=None):
-    if data is None:
-        bottomwears = Product.objects.filter(category='BW')
-    elif data == 'below':
-        bottomwears = Product.objects.filter(category='BW', discounted_price__lt=1000)
-    elif data == 'above':
-        bottomwears = Product.objects.filter(category='BW', discounted_price__gt=1000)
-    else:
-        bottomwears = Product.objects.filter(category='BW')
-
-    return render(request, 'app/bottomware.html', {'bottomwears': bottomwears})
+async def bottomwear(request, data=None):
+    return await category_listing(request, 'bottomwear', data)
 
 
 # Search view
-def search(request):
-    q = request.GET.get('q', '')
-    results = []
+async def search(request):
+    q = request.GET.get('q', '').strip()
+    try:
+        page = max(1, min(int(request.GET.get('page', 1)), settings.SEARCH_MAX_PAGE))
+    except ValueError:
+        page = 1
+    results, has_next = [], False
     if q:
-        results = Product.objects.filter(
-            Q(title__icontains=q) |
-            Q(brand__icontains=q) |
-            Q(description__icontains=q)
-        )
-    return render(request, 'app/search_results.html', {'query': q, 'results': results})
+        # ranked full-text lookup, see app/search.py
+        results, has_next = await asearch_products(q, page=page, per_page=settings.SEARCH_PAGE_SIZE)
+    return await arender(request, 'app/search_results.html', {
+        'query': q,
+        'results': results,
+        'page': page,
+        'has_next': has_next,
+    })
 
 
-# ✅ Shoes View
-def shoes(request, data=None):
-    if data is None:
-        shoes = Product.objects.filter(category='S')  # All shoes
-    elif data.upper() in ['KNCHDE', 'MYNOT']:  # Match your brands here
-        shoes = Product.objects.filter(category='S', brand=data)
-    elif data == 'below':
-        shoes = Product.objects.filter(category='S', discounted_price__lt=2500)
-    elif data == 'above':
-        shoes = Product.objects.filter(category='S', discounted_price__gt=3000)
-    else:
-        shoes = Product.objects.filter(category='S')
+# Search-as-you-type API
+def search_suggest_api(request):
+    """Return top-k product suggestions for ``?q=`` as JSON."""
+    q = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 20))
+    except ValueError:
+        limit = 10
+
+    start = time.perf_counter()
+    matches = suggest.index.suggest(q, limit=limit)
+    took_ms = (time.perf_counter() - start) * 1000
+    if took_ms > settings.SUGGEST_LATENCY_BUDGET_MS:
+        logger.warning('search suggest over budget: q=%r took %.2f ms', q, took_ms)
 
-    return render(request, 'app/shoes.html', {'shoes': shoes})
+    return JsonResponse({
+        'query': q,
+        'results': [
+            dict(m, url=reverse('product-detail', args=[m['id']])) for m in matches
+        ],
+        'took_ms': round(took_ms, 3),
+    })
 
 
-# ✅ Laptop View
-def laptop(request, data=None):
-    if data is None:
-        laptops = Product.objects.filter(category='L')  # All laptops
-    elif data.upper() in ['HP', 'DELL']:  # Brand filters
-        laptops = Product.objects.filter(category='L', brand=data)
-    elif data == 'below':
-        laptops = Product.objects.filter(category='L', discounted_price__lt=20000)
-    elif data == 'above':
-        laptops = Product.objects.filter(category='L', discounted_price__gt=25000)
-    else:
-        laptops = Product.objects.filter(category='L')
+# ✅ Shoes View
+async def shoes(request, data=None):
+    return await category_listing(request, 'shoes', data)
 
-    return render(request, 'app/laptop.html', {'laptops': laptops})
+
+# ✅ Laptop View
+async def laptop(request, data=None):
+    return await category_listing(request, 'laptop', data)
 
 
 def login(request):
@@ -410,12 +405,14 @@ def login(request):
             # detect if this is the user's first login by checking last_login
             first_login = user.last_login is None
             auth_login(request, user)
+            # move anything added to the cart while logged out into the Cart table
+            cart.merge_anonymous_cart(user, cart.load_anonymous_cart(request))
             if first_login:
                 messages.success(request, 'Welcome — your profile is created. Please review your details.')
-                return redirect('profile')
+                return cart.save_anonymous_cart(redirect('profile'), {})
 
             messages.success(request, 'Login successfully')
-            return redirect('home')
+            return cart.save_anonymous_cart(redirect('home'), {})
         else:
             messages.error(request, 'Invalid username or password')
             return render(request, 'app/login.html')
@@ -442,7 +439,16 @@ class CustomerRegistrationView(View):
 
 # ✅ Checkout Page View
 def checkout(request):
-    return render(request, 'app/checkout.html')
+    context = {}
+    if request.user.is_authenticated:
+        summary = cart_summary(request.user)
+        context = {
+            'cart_items': summary.items,
+            'amount': summary.amount,
+            'shipping': summary.shipping,
+            'total': summary.total,
+        }
+    return render(request, 'app/checkout.html', context)
 
 
 # ✅ Payment Done View
@@ -450,29 +456,18 @@ def checkout(request):
 def payment_done(request):
     user = request.user
     custid = request.GET.get('custid') or request.POST.get('custid')
-    payment_method = request.POST.get('payment_method')  # 👈 Selected payment method
+    payment_method = request.POST.get('payment_method') or 'COD'  # 👈 Selected payment method
 
     if not custid:
         return render(request, 'app/checkout.html', {'error': 'Customer not selected'})
 
     customer = Customer.objects.get(id=custid)
-    cart_items = Cart.objects.filter(user=user)
-
-    for item in cart_items:
-        OrderPlaced(
-            user=user,
-            customer=customer,
-            product=item.product,
-            quantity=item.quantity,
-            status='Accepted',  # Default status
-            payment_method=payment_method,
-            tracking_id=str(uuid.uuid4()),
-        ).save()
-
-    cart_items.delete()
+    # single transaction, constant number of queries regardless of cart size
+    result = place_order(user, customer, payment_method)
 
     return render(request, 'app/order_success.html', {
         'payment_method': payment_method,
+        'tracking_id': result.order.tracking_id if result.order else None,
     })
 
 
@@ -492,9 +487,9 @@ def logout_view(request):
     return redirect('login')
 
 
-def track_order(request):
-    """Allow users to enter a tracking id and view associated order(s)."""
-    orders = None
+async def track_order(request):
+    """Allow users to enter a tracking id and view the matching order."""
+    order = None
     tracking = ''
     # support GET (e.g., /trackorder/?tracking_id=...) and POST from the form
     if request.method == 'POST':
@@ -503,11 +498,20 @@ def track_order(request):
         tracking = request.GET.get('tracking_id', '').strip()
 
     if tracking:
-        orders = OrderPlaced.objects.filter(tracking_id=tracking)
-        if not orders.exists():
+        order = await (
+            Order.objects.filter(tracking_id=tracking)
+            .prefetch_related('lines__product', order_events.timeline_prefetch())
+            .afirst()
+        )
+        if order is None:
             messages.error(request, 'No orders found for that tracking id')
 
-    return render(request, 'app/track_order.html', {'orders': orders, 'tracking': tracking})
+    return await arender(request, 'app/track_order.html', {
+        'order': order,
+        'tracking': tracking,
+        'can_cancel': order is not None and order_status.can_transition(order.status, order_status.CANCELLED),
+        'can_return': order is not None and order_status.can_transition(order.status, order_status.RETURNED),
+    })
 
 
 @login_required
@@ -517,18 +521,16 @@ def cancel_order(request, order_id):
         messages.error(request, 'Invalid request method')
         return redirect('track-order')
 
-    order = get_object_or_404(OrderPlaced, id=order_id)
+    order = get_object_or_404(Order, id=order_id)
     # only allow owner to cancel
     if order.user != request.user:
         messages.error(request, 'Unauthorized')
         return redirect('track-order')
 
-    if order.status in ['Cancelled', 'Returned']:
-        messages.info(request, 'Order already cancelled or returned')
-    else:
-        order.status = 'Cancelled'
-        order.save()
+    if order_status.transition(order, order_status.CANCELLED, 'customer'):
         messages.success(request, 'Order cancelled')
+    else:
+        messages.info(request, f'An order that is {order.status} can no longer be cancelled')
 
     return redirect('track-order')
 
@@ -539,17 +541,15 @@ def return_order(request, order_id):
         messages.error(request, 'Invalid request method')
         return redirect('track-order')
 
-    order = get_object_or_404(OrderPlaced, id=order_id)
+    order = get_object_or_404(Order, id=order_id)
     if order.user != request.user:
         messages.error(request, 'Unauthorized')
         return redirect('track-order')
 
-    if order.status == 'Returned':
-        messages.info(request, 'Order already returned')
-    else:
-        order.status = 'Returned'
-        order.save()
+    if order_status.transition(order, order_status.RETURNED, 'customer'):
         messages.success(request, 'Order marked as returned')
+    else:
+        messages.info(request, 'Only delivered orders can be returned')
 
     return redirect('track-order')
 
@@ -599,3 +599,33 @@ def csrf_debug(request):
         'token': token,
         'cookie_val': cookie_val,
     })
+
+
+@staff_member_required
+def order_status_bulk_api(request):
+    """Apply warehouse status changes posted as CSV (``text/csv``) or JSONL.
+
+    The body is read line by line and applied in chunks, see app/order_status.py.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    lines = order_status.decode_lines(request)
+    if request.content_type == 'text/csv':
+        rows = order_status.read_csv(lines)
+    else:
+        rows = order_status.read_jsonl(lines)
+    report = order_status.apply_status_updates(rows, settings.ORDER_STATUS_CHUNK_SIZE)
+    return JsonResponse(report.as_dict())
+
+
+@staff_member_required
+def request_metrics_api(request):
+    """Rolling per-view latency/query percentiles from RequestMetricsMiddleware."""
+    if request.method == 'POST' and request.POST.get('reset'):
+        metrics.reset()
+        product_page.hits.reset()
+    return JsonResponse({
+        'window': metrics.window,
+        'views': metrics.snapshot(),
+        'product_page': product_page.hits.snapshot(),
+    })
@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Run it with any ASGI server, e.g. ``uvicorn onlineshopping.asgi:application``.
+The catalogue, search and order tracking views are async (their queries
+still run on a per-request thread, as Django's async ORM does); the other
+views are sync and run in a thread pool. ``manage.py bench_asgi`` compares
+this stack with WSGI under a burst of simultaneous requests.
 """
 
 import os
@@ -12,5 +18,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'onlineshopping.settings')
+# ✅ ASGI deployment profile, see SERVER_INTERFACE in settings
+os.environ.setdefault('SERVER_INTERFACE', 'asgi')
+
+django_application = get_asgi_application()
+
+from app.static_handler import AsyncStaticAssetsHandler  # noqa: E402  (needs settings)
 
-application = get_asgi_application()
+# ✅ serve collected, precompressed static files without a front proxy
+application = AsyncStaticAssetsHandler(django_application)
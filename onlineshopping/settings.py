@@ -4,6 +4,7 @@ Django settings for onlineshopping project.
 Generated by 'django-admin startproject' using Django 5.2.7.
 """
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,6 +25,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.RequestMetricsMiddleware',  # ✅ first, so it times the whole stack
+    'app.routers.ReplicaPinMiddleware',  # ✅ read-your-writes for the read replica
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,21 +48,80 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app.context_processors.cart_badge',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'onlineshopping.wsgi.application'
+ASGI_APPLICATION = 'onlineshopping.asgi.application'
+
+# ✅ 'asgi' when served by an ASGI server (onlineshopping/asgi.py sets it).
+# Under ASGI every request gets its own database connection, so persistent
+# connections are never reused and would only pile up: CONN_MAX_AGE is 0.
+SERVER_INTERFACE = os.environ.get('SERVER_INTERFACE', 'wsgi')
 
 # Database
+# ✅ DATABASE_PROFILE picks the SQLite tuning: pragmas run on every new
+# connection (app/db.py), driver options and connection reuse.
+# 'default' holds everything that lasts only as long as the connection:
+# busy timeout, page cache, IMMEDIATE transactions (no "database is locked"
+# when two read-then-write transactions meet) and connection reuse.
+# 'tuned' adds journal_mode=WAL, which is written into the database file
+# header, so deployments opt in with DATABASE_PROFILE=tuned and management
+# commands leave the tracked db.sqlite3 untouched. 'plain' is stock
+# SQLite/Django behaviour, the baseline for `manage.py bench_sqlite`.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'default')
+_CONNECTION_PRAGMAS = {
+    'busy_timeout': 20000,            # ms to wait on a lock before failing
+    'mmap_size': 256 * 1024 * 1024,   # bytes of the file read via mmap
+    'cache_size': -64000,             # KiB of page cache (negative = size, not pages)
+    'temp_store': 'MEMORY',
+}
+SQLITE_PROFILES = {
+    'plain': {'pragmas': {}, 'options': {}, 'conn_max_age': 0},
+    'default': {
+        'pragmas': _CONNECTION_PRAGMAS,
+        # take the write lock when a transaction starts, so two read-then-write
+        # transactions can't deadlock ("database is locked")
+        'options': {'transaction_mode': 'IMMEDIATE'},
+        'conn_max_age': 60,
+    },
+    'tuned': {
+        'pragmas': {
+            'journal_mode': 'WAL',            # readers and the writer don't block each other
+            'synchronous': 'NORMAL',          # with WAL, fsync only at checkpoints
+            **_CONNECTION_PRAGMAS,
+        },
+        'options': {'transaction_mode': 'IMMEDIATE'},
+        'conn_max_age': 60,
+    },
+}
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_PROFILES[DATABASE_PROFILE]['options'],
+        # keep connections open between requests, checked before reuse
+        'CONN_MAX_AGE': 0 if SERVER_INTERFACE == 'asgi' else SQLITE_PROFILES[DATABASE_PROFILE]['conn_max_age'],
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# ✅ Optional read replica (app/routers.py): set DATABASE_REPLICA to a second
+# SQLite file kept up to date with `manage.py sync_replica`. Catalogue and
+# order-history reads go there; visitors who just wrote stay on the primary
+# for REPLICA_PIN_SECONDS.
+if os.environ.get('DATABASE_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['app.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -81,8 +143,103 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / "staticfiles"  # required for collectstatic
 
+# collectstatic writes content-hashed names plus .gz/.br siblings
+# (app/storage.py); onlineshopping/wsgi.py serves them (app/static_handler.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.storage.CompressedManifestStaticFilesStorage'},
+}
+# hashed static file names never change content, so cache them for a year
+STATIC_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
 # ✅ Media files (for product images etc.)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How app/media.py sends media files: 'django' streams them itself,
+# 'x-accel-redirect' (nginx, internal location at MEDIA_ACCEL_PREFIX) or
+# 'x-sendfile' (Apache/lighttpd) hand the transfer to the proxy in front.
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
+
+# Product image derivatives (see app/images.py): widths in px, whether to
+# also write AVIF when Pillow supports it, and whether saving a product
+# builds them immediately (otherwise run build_image_derivatives).
+IMAGE_DERIVATIVE_WIDTHS = [200, 400, 800]
+IMAGE_DERIVATIVE_AVIF = True
+IMAGE_DERIVATIVES_ON_SAVE = True
+
+# ✅ Cache (home page fragments etc.)
+# Local memory by default; set DJANGO_CACHE=file to share the cache between
+# worker processes without running an external cache server.
+if os.environ.get('DJANGO_CACHE') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'onlineshopping',
+        }
+    }
+
+# Seconds a rendered home page slider may be served before it is rebuilt.
+# Product saves invalidate it immediately in the process (or shared cache)
+# that made the change; the timeout bounds staleness for other processes.
+HOME_CACHE_TIMEOUT = 300
+
+# Products per page on the category listing pages (keyset paginated)
+CATEGORY_PAGE_SIZE = 24
+
+# Results per page on the search page, and the deepest page served
+# (larger ?page= values are clamped, keeping OFFSET within SQLite's integers)
+SEARCH_PAGE_SIZE = 24
+SEARCH_MAX_PAGE = 100
+
+# Search-as-you-type lookups slower than this are logged as warnings
+SUGGEST_LATENCY_BUDGET_MS = 50
+
+# The search-as-you-type index lives in each process (app/suggest.py): it
+# reads products saved by other processes at most this often, and rebuilds
+# (dropping products they deleted) at most this often, in seconds
+SUGGEST_SYNC_SECONDS = 5
+SUGGEST_REBUILD_SECONDS = 300
+
+# Anonymous carts live in a signed cookie until login (see app/cart.py)
+ANON_CART_MAX_AGE = 60 * 60 * 24 * 30
+ANON_CART_MAX_LINES = 100
+
+# Product detail page (app/product_page.py): how long the product version
+# and rendered pages stay cached (saves drop them in this process, the
+# timeout bounds staleness elsewhere), and the browser/proxy max-age of the
+# public page anonymous visitors get
+PRODUCT_PAGE_CACHE_TIMEOUT = 300
+PRODUCT_PAGE_MAX_AGE = 60
+
+# Status rows per batched UPDATE in the warehouse status pipeline
+# (app/order_status.py); the command takes --chunk-size instead
+ORDER_STATUS_CHUNK_SIZE = 500
+
+# Rows fetched from the cursor at a time by the streaming CSV/JSONL exports
+# (app/exports.py); export_data takes --chunk-size instead
+EXPORT_CHUNK_SIZE = 2000
+
+# Seconds the cached navbar cart summary lives. Cart changes refresh it in
+# the process (or shared cache) that made them; like the page caches above,
+# the timeout bounds staleness for other processes
+CART_BADGE_TIMEOUT = 300
+
+# Request instrumentation (app/middleware.py): samples kept per view for the
+# percentiles at /api/metrics/requests/, the default and per-view (URL name)
+# query budgets, and whether exceeding one raises instead of logging.
+REQUEST_METRICS_WINDOW = 1000
+REQUEST_QUERY_BUDGET = 20
+REQUEST_QUERY_BUDGETS = {}
+REQUEST_QUERY_BUDGET_RAISE = False
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
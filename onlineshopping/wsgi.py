@@ -13,4 +13,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'onlineshopping.settings')
 
-application = get_wsgi_application()
+from app.static_handler import StaticAssetsHandler  # noqa: E402  (needs settings)
+
+# ✅ serve collected, precompressed static files without a front proxy
+application = StaticAssetsHandler(get_wsgi_application())